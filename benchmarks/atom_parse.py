@@ -0,0 +1,59 @@
+# compares the atom parser of the /youtube route with parsing the whole document with xmltodict
+# usage: python benchmarks/atom_parse.py [iterations]
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ext.atom import parse_feed  # noqa: E402
+
+try:
+    import xmltodict
+except ImportError:
+    xmltodict = None
+
+PAYLOADS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "payloads")
+
+
+# the fields the old handler read from the xmltodict tree
+def xmltodict_fields(data):
+    obj = xmltodict.parse(data)
+    if "at:deleted-entry" in obj["feed"]:
+        entry = obj["feed"]["at:deleted-entry"]
+        return entry["@ref"], entry["at:by"]["uri"].split("/")[-1]
+    entry = obj["feed"]["entry"]
+    link = entry["link"][0] if isinstance(entry["link"], list) else entry["link"]
+    return entry["yt:videoId"], entry["yt:channelId"], link["@href"]
+
+
+# peak memory allocated while parsing once
+def peak_allocation(parse, data):
+    tracemalloc.start()
+    parse(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    parsers = [("atom", parse_feed)]
+    if xmltodict is not None:
+        parsers.append(("xmltodict", xmltodict_fields))
+    else:
+        print("xmltodict is not installed, only the atom parser is measured")
+
+    for name in sorted(os.listdir(PAYLOADS)):
+        with open(os.path.join(PAYLOADS, name), "rb") as f:
+            data = f.read()
+        print(f"{name} ({len(data)} bytes)")
+        for parser_name, parse in parsers:
+            seconds = timeit.timeit(lambda: parse(data), number=iterations)
+            peak = peak_allocation(parse, data)
+            print(f"  {parser_name:<10} {seconds / iterations * 1e6:8.1f} us/parse  {peak / 1024:6.1f} KiB peak")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# compares analysing a surrender@20 post for every server with analysing it once and sharing it
+# usage: python benchmarks/post_analysis.py [servers] [iterations]
+import os
+import re
+import sys
+import timeit
+
+import discord
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ext.keywords import KeywordIndex  # noqa: E402
+from ext.posts import PostCache  # noqa: E402
+
+PAYLOAD = os.path.join(os.path.dirname(os.path.abspath(__file__)), "posts", "surrenderat20_post.html")
+KEYWORDS = ["ahri", "lux", "thresh", "q cooldown", "skin", "yasuo", "jinx", "pbe"]
+CLEANR = re.compile('<.*?>')
+
+
+# the per server work done before posts were analysed once
+def per_server(content, servers, keywords):
+    for guild in range(servers):
+        emb = discord.Embed(title="PBE Preview", color=discord.Colour.orange())
+        startImgPos = content.find('<img', 0, len(content)) + 4
+        if(startImgPos > -1):
+            endImgPos = content.find('>', startImgPos, len(content))
+            imageTag = content[startImgPos:endImgPos]
+            apostrophe = "'" if "'" in imageTag else '"'
+            startSrcPos = imageTag.find('src=' + apostrophe, 0, len(content)) + 5
+            endSrcPos = imageTag.find(apostrophe, startSrcPos, len(content))
+            emb.set_image(url=imageTag[startSrcPos:endSrcPos])
+        cleantext = re.sub(CLEANR, '', content.replace("<br />", "\n")).replace("&nbsp;", " ")
+        firstpart = " ".join(cleantext.split("\n")[0:5])
+        note = firstpart[firstpart.find("["):firstpart.rfind("]") + 1]
+        if note != "":
+            emb.add_field(name=note, value="-")
+        for keyword in keywords[guild]:
+            kw = " " + keyword + " "
+            if kw in cleantext.lower():
+                extracts = [part.strip() for part in cleantext.split("\n") if kw in part.lower()]
+                value = "\n\n".join(extracts)
+                if len(value) > 950:
+                    value = value[:950] + "... `" + str(cleantext.lower().count(kw)) + "` mentions in total"
+                emb.add_field(name=f"'{keyword}' was mentioned in this post!", value=value, inline=False)
+
+
+# analyse once, only the embed is assembled per server
+def shared(content, servers, index):
+    posts = PostCache()
+    analysis = posts.get("1", content)
+    emb = discord.Embed(title="PBE Preview", color=discord.Colour.orange())
+    if analysis.image is not None:
+        emb.set_image(url=analysis.image)
+    if analysis.note != "":
+        emb.add_field(name=analysis.note, value="-")
+    matches = analysis.keyword_matches(index)
+    for guild in range(servers):
+        guild_emb = emb.copy()
+        for keyword in index.get(guild):
+            value = matches.extract(keyword)
+            if value is not None:
+                guild_emb.add_field(name=f"'{keyword}' was mentioned in this post!", value=value, inline=False)
+
+
+def main():
+    servers = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    with open(PAYLOAD, encoding="utf-8") as f:
+        content = f.read()
+
+    # every server uses three of the keywords
+    keywords = {guild: [KEYWORDS[(guild + i) % len(KEYWORDS)] for i in range(3)] for guild in range(servers)}
+    index = KeywordIndex()
+    for guild, guild_keywords in keywords.items():
+        for keyword in guild_keywords:
+            index.add(guild, keyword)
+
+    print(f"{len(content)} byte post, {servers} servers with 3 keywords each")
+    for name, run in [("per server", lambda: per_server(content, servers, keywords)),
+                      ("shared", lambda: shared(content, servers, index))]:
+        seconds = timeit.timeit(run, number=iterations) / iterations
+        print(f"  {name:<10} {seconds * 1e3:8.2f} ms/post  {seconds / servers * 1e6:8.1f} us/server")
+
+
+if __name__ == "__main__":
+    main()
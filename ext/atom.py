@@ -0,0 +1,95 @@
+from xml.etree.ElementTree import XMLPullParser
+
+
+# namespaces of the elements used in youtube push notifications
+ATOM = "{http://www.w3.org/2005/Atom}"
+YT = "{http://www.youtube.com/xml/schemas/2015}"
+AT = "{http://purl.org/atompub/tombstones/1.0}"
+
+
+class FeedEvent:
+    """The fields of a youtube push notification the bot needs
+
+    `deleted` is set if the notification is about a deleted video, then
+    only `video_id`, `channel_id` and `updated` are available."""
+
+    __slots__ = ("video_id", "channel_id", "link", "updated", "deleted")
+
+    def __init__(self):
+        self.video_id = None
+        self.channel_id = None
+        self.link = None
+        self.updated = None
+        self.deleted = False
+
+
+class AtomParser:
+    """Incremental parser for youtube push notifications
+
+    The body can be fed in chunks as it arrives. Only the fields of a
+    FeedEvent are read and every element is dropped once it was handled,
+    so no tree of the whole document is kept."""
+
+    def __init__(self):
+        self.parser = XMLPullParser(events=("start", "end"))
+        self.event = FeedEvent()
+        self.in_entry = False
+        self.in_deleted = False
+
+    def feed(self, data):
+        self.parser.feed(data)
+        self.handle()
+
+    # finish parsing and return the event, raises ParseError on malformed documents
+    def close(self):
+        self.parser.close()
+        self.handle()
+        return self.event
+
+    def handle(self):
+        event = self.event
+        for action, elem in self.parser.read_events():
+            tag = elem.tag
+            if action == "start":
+                if tag == ATOM + "entry":
+                    self.in_entry = True
+                elif tag == AT + "deleted-entry":
+                    # the deleted video is only referenced as "yt:video:<id>"
+                    self.in_deleted = True
+                    event.deleted = True
+                    event.video_id = elem.get("ref", "").split(":")[-1]
+                    event.updated = elem.get("when")
+                elif tag == ATOM + "link" and self.in_entry and event.link is None:
+                    event.link = elem.get("href")
+                continue
+
+            if self.in_entry:
+                if tag == YT + "videoId":
+                    event.video_id = elem.text
+                elif tag == YT + "channelId":
+                    event.channel_id = elem.text
+                elif tag == ATOM + "updated":
+                    event.updated = elem.text
+                elif tag == ATOM + "entry":
+                    self.in_entry = False
+            elif self.in_deleted:
+                if tag == ATOM + "uri":
+                    event.channel_id = (elem.text or "").split("/")[-1]
+                elif tag == AT + "deleted-entry":
+                    self.in_deleted = False
+            elem.clear()
+
+
+# parse a notification from a stream of bytes like aiohttp's request.content
+async def read_feed(stream):
+    parser = AtomParser()
+    async for chunk in stream.iter_any():
+        parser.feed(chunk)
+    return parser.close()
+
+
+# parse a notification which was already read completely
+def parse_feed(data):
+    parser = AtomParser()
+    parser.feed(data)
+    return parser.close()
@@ -0,0 +1,137 @@
+import time
+from collections import OrderedDict
+
+
+class ValidatorCache:
+    """Makes repeated requests to the same url conditional
+
+    The ETag and Last-Modified validators of every response are kept together
+    with the decoded body. Follow up requests send If-None-Match and
+    If-Modified-Since and on a 304 response the stored body is reused
+    without downloading or decoding it again."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()  # request key -> (etag, last modified, body)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(url, params):
+        if params is None:
+            return url
+        return url + "?" + "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+
+    # returns the status, the decoded json body and whether the body changed
+    async def get_json(self, session, url, params=None, headers=None):
+        key = self.key(url, params)
+        request_headers = dict(headers) if headers is not None else {}
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            etag, last_modified, body = entry
+            if etag is not None:
+                request_headers["If-None-Match"] = etag
+            if last_modified is not None:
+                request_headers["If-Modified-Since"] = last_modified
+
+        async with session.get(url, params=params, headers=request_headers) as resp:
+            if resp.status == 304 and entry is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return 200, entry[2], False
+
+            self.misses += 1
+            if resp.status >= 400:
+                return resp.status, None, True
+            body = await resp.json()
+
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+            if etag is not None or last_modified is not None:
+                self.entries[key] = (etag, last_modified, body)
+                self.entries.move_to_end(key)
+                if len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+            else:
+                self.entries.pop(key, None)
+
+        return resp.status, body, True
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
+
+class TTLCache:
+    """Keeps up to `maxsize` values for `ttl` seconds each
+
+    The least recently used value is dropped first once the cache is full."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expiry time, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.entries.pop(key, None)
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return default
+        return entry[1]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class IdempotencyStore:
+    """Remembers recently handled events so redeliveries can be dropped
+
+    An event is only remembered once it was handled successfully, up to
+    `maxsize` event keys are kept for `ttl` seconds each. Events which are
+    still being handled are dropped as well."""
+
+    def __init__(self, maxsize=10000, ttl=24 * 60 * 60):
+        self.seen = TTLCache(maxsize, ttl)
+        self.pending = set()  # keys of the events being handled
+        self.duplicates = 0
+
+    # start handling the event, returns False if it was handled before or is being handled
+    def begin(self, key):
+        if key in self.pending or self.seen.get(key) is not None:
+            self.duplicates += 1
+            return False
+        self.pending.add(key)
+        return True
+
+    # remember the event as handled
+    def done(self, key):
+        self.pending.discard(key)
+        self.seen.set(key, True)
+
+    # the event failed, it can be handled again when it is redelivered
+    def discard(self, key):
+        self.pending.discard(key)
+
+    def __len__(self):
+        return len(self.seen)
@@ -0,0 +1,130 @@
+import discord
+
+import asyncio
+import sys
+import time
+import traceback
+from collections import deque
+
+
+# maximum number of messages being sent at the same time
+DELIVERY_CONCURRENCY = 25
+# discord allows 5 messages per 5 seconds in a channel and about 50 requests per second overall
+CHANNEL_RATE = (5, 5.0)
+GLOBAL_RATE = (50, 1.0)
+# seconds between two sweeps of the channel buckets which are full again
+BUCKET_SWEEP_INTERVAL = 60
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` actions per `per` seconds"""
+
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self.allowance = rate
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    # wait until an action is allowed
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.allowance = min(self.rate, self.allowance +
+                                     (now - self.updated) * self.rate / self.per)
+                self.updated = now
+                if self.allowance >= 1:
+                    self.allowance -= 1
+                    return
+                await asyncio.sleep((1 - self.allowance) * self.per / self.rate)
+
+    # whether nobody is waiting and the bucket has filled up again, it can be dropped then
+    def idle(self, now):
+        if self.lock.locked():
+            return False
+        return self.allowance + (now - self.updated) * self.rate / self.per >= self.rate
+
+
+class DeliveryReport:
+    """Outcome of sending one notification to all of its channels"""
+
+    __slots__ = ("name", "results", "elapsed")
+
+    def __init__(self, name):
+        self.name = name
+        self.results = {}  # key -> sent message or the exception raised while sending
+        self.elapsed = 0.0
+
+    @property
+    def sent(self):
+        return sum(1 for r in self.results.values() if not isinstance(r, Exception))
+
+    @property
+    def failed(self):
+        return len(self.results) - self.sent
+
+    def __str__(self):
+        return f"{self.name}: {self.sent} sent, {self.failed} failed in {self.elapsed:.1f}s"
+
+
+class Delivery:
+    """Sends messages to many channels at once
+
+    Sends run concurrently up to DELIVERY_CONCURRENCY while every channel
+    and the bot as a whole stay within discord's rate limits."""
+
+    def __init__(self):
+        self.limiter = asyncio.Semaphore(DELIVERY_CONCURRENCY)
+        self.global_bucket = RateLimiter(*GLOBAL_RATE)
+        self.channel_buckets = {}  # channel id -> RateLimiter
+        self.swept = time.monotonic()
+        self.reports = deque(maxlen=10)
+
+    # send a single message within the rate limits
+    async def send(self, channel, content=None, embed=None):
+        self.sweep()
+        bucket = self.channel_buckets.get(channel.id)
+        if bucket is None:
+            bucket = self.channel_buckets[channel.id] = RateLimiter(
+                *CHANNEL_RATE)
+        await bucket.acquire()
+
+        async with self.limiter:
+            await self.global_bucket.acquire()
+            return await channel.send(content, embed=embed)
+
+    # drop the buckets of channels which haven't been sent to for a while
+    def sweep(self):
+        now = time.monotonic()
+        if now - self.swept < BUCKET_SWEEP_INTERVAL:
+            return
+        self.swept = now
+        for channel_id, bucket in list(self.channel_buckets.items()):
+            if bucket.idle(now):
+                del self.channel_buckets[channel_id]
+
+    # send messages, given as (key, channel, content, embed), and report the result for every key
+    # the report is kept with the recent reports unless `record` is False
+    async def deliver(self, name, messages, record=True):
+        report = DeliveryReport(name)
+        start = time.monotonic()
+
+        async def send(key, channel, content, embed):
+            try:
+                report.results[key] = await self.send(channel, content, embed)
+            except Exception as ex:
+                report.results[key] = ex
+                # missing permissions are common and not worth a traceback
+                if not isinstance(ex, discord.errors.Forbidden):
+                    print(f'Ignoring exception in Delivery.deliver() for {name}',
+                          file=sys.stderr)
+                    traceback.print_exception(
+                        type(ex), ex, ex.__traceback__, file=sys.stderr)
+
+        await asyncio.gather(*[send(*message) for message in messages])
+
+        report.elapsed = time.monotonic() - start
+        if record:
+            self.reports.append(report)
+        return report
@@ -0,0 +1,179 @@
+from bisect import bisect_right
+
+
+# mentions longer than this are cut off in the embed field
+EXTRACT_LENGTH = 950
+
+
+class Automaton:
+    """Aho-Corasick automaton finding all patterns in one pass over a text"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]  # state -> character -> next state
+        self.fail = [0]
+        self.pattern = [None]  # state -> pattern spelled out by it
+        self.output = [[]]  # state -> patterns ending in it
+        for pattern in patterns:
+            self.insert(pattern)
+        self.link()
+
+    # add a pattern to an automaton which is already in use
+    def add(self, pattern):
+        self.insert(pattern)
+        self.link()
+
+    def insert(self, pattern):
+        state = 0
+        for char in pattern:
+            following = self.goto[state].get(char)
+            if following is None:
+                following = len(self.goto)
+                self.goto[state][char] = following
+                self.goto.append({})
+                self.fail.append(0)
+                self.pattern.append(None)
+                self.output.append([])
+            state = following
+        self.pattern[state] = pattern
+
+    # set the failure links breadth first, every state also outputs the patterns of its failure state
+    def link(self):
+        queue = list(self.goto[0].values())
+        for state in queue:
+            self.fail[state] = 0
+            self.output[state] = [self.pattern[state]] if self.pattern[state] is not None else []
+        for state in queue:
+            for char, following in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[following] = self.goto[fallback].get(char, 0)
+                own = [self.pattern[following]] if self.pattern[following] is not None else []
+                self.output[following] = own + self.output[self.fail[following]]
+                queue.append(following)
+
+    # yields the start position and pattern of every match
+    def search(self, text):
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern in output[state]:
+                yield end - len(pattern), pattern
+
+
+class Matches:
+    """Keyword mentions in a post, found with one search for all keywords"""
+
+    def __init__(self, paragraphs, lowered_paragraphs, separator, found):
+        self.paragraphs = paragraphs
+        self.hits = {}  # keyword pattern -> (paragraph indexes, number of mentions)
+
+        starts = []
+        ends = []
+        position = 0
+        for paragraph in lowered_paragraphs:
+            starts.append(position)
+            ends.append(position + len(paragraph))
+            position += len(paragraph) + len(separator)
+
+        last_end = {}
+        for start, pattern in found:
+            # mentions are counted without overlaps like str.count does
+            if start < last_end.get(pattern, 0):
+                continue
+            last_end[pattern] = start + len(pattern)
+
+            paragraphs, count = self.hits.get(pattern, ([], 0))
+            index = bisect_right(starts, start) - 1
+            # mentions spanning paragraphs are counted but not extracted
+            if start + len(pattern) <= ends[index] and (len(paragraphs) == 0 or paragraphs[-1] != index):
+                paragraphs.append(index)
+            self.hits[pattern] = (paragraphs, count + 1)
+
+    # the embed field value for a keyword, None if it isn't mentioned
+    def extract(self, keyword):
+        hit = self.hits.get(" " + keyword + " ")
+        if hit is None:
+            return None
+        paragraphs, count = hit
+
+        exctracts_string = "\n\n".join(
+            self.paragraphs[index].strip() for index in paragraphs)
+        if len(exctracts_string) > EXTRACT_LENGTH:
+            exctracts_string = exctracts_string[:EXTRACT_LENGTH] + "... `" + str(
+                count) + "` mentions in total"
+        return exctracts_string
+
+
+class KeywordIndex:
+    """In memory copy of the keywords of all guilds
+
+    All keywords are searched for at once with an Aho-Corasick automaton,
+    so matching a post costs the same no matter how many guilds there are.
+    New keywords are added to the automaton, it is only rebuilt once a
+    keyword isn't used by any guild anymore."""
+
+    def __init__(self):
+        self.guilds = {}  # keyword -> guilds
+        self.keywords = {}  # guild -> keywords in the order they were added
+        self.automaton = None
+        self.version = 0  # changes whenever the set of keywords changes
+
+    async def load(self, repository):
+        async with repository.acquire() as db:
+            rows = await db.all_keywords()
+        self.guilds = {}
+        self.keywords = {}
+        for row in rows:
+            self.add(row[0], row[1])
+
+    def add(self, guild, keyword):
+        guild_keywords = self.keywords.setdefault(guild, [])
+        if keyword in guild_keywords:
+            return
+        guild_keywords.append(keyword)
+        guilds = self.guilds.setdefault(keyword, set())
+        if len(guilds) == 0:
+            self.version += 1
+            if self.automaton is not None:
+                self.automaton.add(" " + keyword + " ")
+        guilds.add(guild)
+
+    def remove(self, guild, keyword):
+        guild_keywords = self.keywords.get(guild, [])
+        if keyword not in guild_keywords:
+            return
+        guild_keywords.remove(keyword)
+        if len(guild_keywords) == 0:
+            del self.keywords[guild]
+        guilds = self.guilds[keyword]
+        guilds.discard(guild)
+        if len(guilds) == 0:
+            del self.guilds[keyword]
+            self.version += 1
+            self.automaton = None
+
+    def remove_guild(self, guild):
+        for keyword in list(self.keywords.get(guild, [])):
+            self.remove(guild, keyword)
+
+    # keywords of a guild
+    def get(self, guild):
+        return self.keywords.get(guild, [])
+
+    # find the mentions of every keyword in a post, paragraphs are split by the separator
+    def match(self, text, separator="\n"):
+        return self.match_paragraphs(text.split(separator), text.lower().split(separator), separator)
+
+    # same as match for a post which is already split into paragraphs
+    def match_paragraphs(self, paragraphs, lowered_paragraphs, separator="\n"):
+        if self.automaton is None:
+            # keywords are only matched as whole words
+            self.automaton = Automaton(" " + keyword + " " for keyword in self.guilds)
+        found = self.automaton.search(separator.join(lowered_paragraphs))
+        return Matches(paragraphs, lowered_paragraphs, separator, found)
@@ -0,0 +1,221 @@
+import asyncio
+import auth_token
+import datetime
+import sys
+import time
+import traceback
+
+from ext.delivery import RateLimiter
+
+
+# seconds a subscription is requested for, the longest the hubs allow
+LEASE_SECONDS = 864000
+# leases are renewed within a day, starting two days before they run out
+RENEW_BEFORE = 2 * 24 * 60 * 60
+RENEW_WINDOW = 24 * 60 * 60
+# seconds covered by every slot of the timing wheel
+TICK = 5 * 60
+# renewals sent at the same time and per second at most
+RENEW_CONCURRENCY = 4
+RENEW_RATE = (2, 1.0)
+# a renewal is sent again if it wasn't verified within VERIFY_TIMEOUT seconds
+# or after RETRY_DELAY seconds if the hub did not accept it
+VERIFY_TIMEOUT = 60 * 60
+RETRY_DELAY = 15 * 60
+
+# hub and topic prefix for every kind of webhook subscription
+HUBS = {"youtube": ("https://pubsubhubbub.appspot.com/subscribe",
+                    "https://www.youtube.com/xml/feeds/videos.xml?channel_id="),
+        "twitch": ("https://api.twitch.tv/helix/webhooks/hub",
+                   "https://api.twitch.tv/helix/streams?user_id=")}
+
+
+class TimingWheel:
+    """Keys bucketed by the tick they are due in
+
+    The wheel has one slot per tick of `span` seconds. Keys can be given a
+    range of times and are placed in the emptiest slot of that range, which
+    spreads them evenly."""
+
+    def __init__(self, tick, span):
+        self.tick = tick
+        self.slots = [set() for _ in range(span // tick + 1)]
+        self.due = {}  # key -> tick it is due in
+        self.current = int(time.time() // tick)
+
+    def schedule(self, key, earliest, latest=None):
+        self.cancel(key)
+        if latest is None:
+            latest = earliest
+        size = len(self.slots)
+        first = max(int(earliest // self.tick), self.current)
+        last = min(max(first, int(latest // self.tick)), first + size - 1)
+        best = min(range(first, last + 1),
+                   key=lambda t: len(self.slots[t % size]))
+        self.slots[best % size].add(key)
+        self.due[key] = best
+
+    def cancel(self, key):
+        tick = self.due.pop(key, None)
+        if tick is not None:
+            self.slots[tick % len(self.slots)].discard(key)
+
+    # move the wheel forward to `now` and return the keys which are due
+    def advance(self, now):
+        size = len(self.slots)
+        target = int(now // self.tick)
+        due = []
+        for tick in range(self.current, min(target + 1, self.current + size)):
+            slot = self.slots[tick % size]
+            for key in [key for key in slot if self.due[key] <= target]:
+                slot.discard(key)
+                del self.due[key]
+                due.append(key)
+        self.current = max(self.current, target + 1)
+        return due
+
+    def __len__(self):
+        return len(self.due)
+
+
+class LeaseScheduler:
+    """Keeps the youtube and twitch webhook subscriptions alive
+
+    The expiry of every lease is stored once the hub verifies it and the
+    lease is renewed shortly before it runs out. Renewals are spread over
+    a timing wheel and sent concurrently within a rate budget."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.wheel = TimingWheel(TICK, LEASE_SECONDS)
+        self.limiter = asyncio.Semaphore(RENEW_CONCURRENCY)
+        self.bucket = RateLimiter(*RENEW_RATE)
+        self.topics = {}  # topic -> (kind, source)
+        self.loaded = False
+        self.load_lock = asyncio.Lock()
+        self.requested = 0
+        self.failed = 0
+        self.verified = 0
+
+    @staticmethod
+    def topic(kind, source):
+        return HUBS[kind][1] + source
+
+    # read the stored leases and schedule their renewal
+    # topics are taken from the subscriptions, leases of topics nobody is subscribed to are left to run out
+    async def load(self):
+        topics = {self.topic(kind, source): (kind, source)
+                  for kind in HUBS for source in self.bot.subscriptions.sources[kind]}
+
+        async with self.bot.repository.acquire() as db:
+            rows = await db.leases()
+            expiries = {row[0]: row[1] for row in rows}
+            async with db.transaction():
+                await db.keep_leases(list(topics))
+                await db.add_leases([(topic, kind, source) for topic, (kind, source) in topics.items()
+                                     if topic not in expiries])
+
+        self.topics = topics
+        for topic in topics:
+            self.plan(topic, expiries.get(topic))
+
+    async def ensure_loaded(self):
+        async with self.load_lock:
+            if not self.loaded:
+                await self.load()
+                self.loaded = True
+
+    # schedule the renewal of a lease, leases of unknown expiry are renewed within the next day
+    def plan(self, topic, expires):
+        if expires is None:
+            start = time.time()
+        else:
+            start = expires.timestamp() - RENEW_BEFORE
+        self.wheel.schedule(topic, start, start + RENEW_WINDOW)
+
+    # will be called by the scheduler of the webserver every tick
+    async def renew_due(self):
+        await self.bot.wait_until_ready()
+        await self.ensure_loaded()
+        renewals = []
+        for topic in self.wheel.advance(time.time()):
+            if topic not in self.topics:
+                continue
+            # servers may have been removed without unsubscribing, such leases are left to run out
+            kind, source = self.topics[topic]
+            if source not in self.bot.subscriptions.sources[kind]:
+                del self.topics[topic]
+                continue
+            renewals.append(self.renew(topic))
+        await asyncio.gather(*renewals)
+
+    # send a subscription request and wait for the hub to verify it
+    async def renew(self, topic):
+        kind, source = self.topics[topic]
+        # the verification can arrive before the request returns
+        self.wheel.schedule(topic, time.time() + VERIFY_TIMEOUT)
+        async with self.limiter:
+            await self.bucket.acquire()
+            try:
+                accepted = await self.request(kind, topic, "subscribe")
+            except Exception as ex:
+                print('Ignoring exception in LeaseScheduler.renew()', file=sys.stderr)
+                traceback.print_exception(
+                    type(ex), ex, ex.__traceback__, file=sys.stderr)
+                accepted = False
+
+        if accepted:
+            self.requested += 1
+        else:
+            self.failed += 1
+            self.wheel.schedule(topic, time.time() + RETRY_DELAY)
+
+    async def request(self, kind, topic, mode):
+        parsingChannelUrl = HUBS[kind][0]
+        parsingChannelQueryString = {"hub.mode": mode, "hub.callback": auth_token.server_url + "/" + kind,
+                                     "hub.topic": topic}
+        if mode == "subscribe":
+            parsingChannelQueryString["hub.lease_seconds"] = LEASE_SECONDS
+        if kind == "twitch":
+            parsingChannelHeader = {'Client-ID': auth_token.twitch_id,
+                                    "Authorization": "Bearer " + auth_token.twitch_token}
+        else:
+            parsingChannelHeader = None
+        async with self.bot.session.post(parsingChannelUrl, headers=parsingChannelHeader, params=parsingChannelQueryString) as resp:
+            if resp.status != 202:
+                print(await resp.text(), file=sys.stderr)
+                return False
+        return True
+
+    # start tracking a topic once the first server subscribes to it
+    async def subscribe(self, kind, source):
+        await self.ensure_loaded()
+        topic = self.topic(kind, source)
+        if topic not in self.topics:
+            self.topics[topic] = (kind, source)
+            async with self.bot.repository.acquire() as db:
+                await db.add_lease(topic, kind, source)
+        await self.renew(topic)
+
+    # stop tracking a topic once no server is subscribed to it anymore
+    async def unsubscribe(self, kind, source):
+        await self.ensure_loaded()
+        topic = self.topic(kind, source)
+        self.topics.pop(topic, None)
+        self.wheel.cancel(topic)
+        async with self.bot.repository.acquire() as db:
+            await db.delete_lease(topic)
+        await self.request(kind, topic, "unsubscribe")
+
+    # store the lease confirmed by a verification request of the hub
+    async def verify(self, query):
+        await self.ensure_loaded()
+        topic = query.get("hub.topic")
+        if query.get("hub.mode") != "subscribe" or topic not in self.topics:
+            return
+        lease = int(query.get("hub.lease_seconds", LEASE_SECONDS))
+        expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=lease)
+        async with self.bot.repository.acquire() as db:
+            await db.set_lease_expiry(topic, expires)
+        self.plan(topic, expires)
+        self.verified += 1
@@ -0,0 +1,218 @@
+import asyncio
+import auth_token
+import datetime
+import time
+
+from ext.cache import TTLCache
+
+
+# seconds lookups are collected before they are sent as one request
+BATCH_WINDOW = 0.2
+# youtube accepts up to 50 ids per request
+YOUTUBE_BATCH_SIZE = 50
+# how long and how many youtube channels are kept in memory
+CHANNEL_CACHE_TTL = 6 * 60 * 60
+CHANNEL_CACHE_SIZE = 5000
+# video counts kept locally are synced with youtube again after this many seconds
+CHANNEL_COUNT_TTL = 30 * 60
+# twitch accepts up to 100 ids per request
+TWITCH_BATCH_SIZE = 100
+# games hardly ever change, users are refreshed every now and then
+GAME_CACHE_TTL = 7 * 24 * 60 * 60
+GAME_CACHE_SIZE = 2000
+USER_CACHE_TTL = 60 * 60
+USER_CACHE_SIZE = 5000
+
+
+class ApiError(Exception):
+    """A lookup request failed, unlike a lookup of something which does not exist"""
+
+    def __init__(self, url, status, error):
+        super().__init__(f"{url} failed with status {status}: {error}")
+        self.status = status
+        self.error = error
+
+
+# decode a response of the youtube or twitch api, raises ApiError on failures like an exhausted quota
+async def api_json(resp):
+    try:
+        obj = await resp.json()
+    except Exception:
+        obj = None
+    if resp.status >= 400 or not isinstance(obj, dict) or "error" in obj:
+        error = obj.get("error") if isinstance(obj, dict) else None
+        raise ApiError(resp.url.path, resp.status, error)
+    return obj
+
+
+class MicroBatcher:
+    """Merges lookups made within a short window into one request
+
+    `fetch` is called with a list of keys and returns a dict with the result
+    for every key it found. Every caller of `get` receives the result of
+    its own key, or None if it was not found."""
+
+    def __init__(self, fetch, window=BATCH_WINDOW, max_size=YOUTUBE_BATCH_SIZE):
+        self.fetch = fetch
+        self.window = window
+        self.max_size = max_size
+        self.pending = {}  # key -> future shared by everyone waiting for it
+        self.timer = None
+        self.requests = 0
+        self.lookups = 0
+
+    async def get(self, key):
+        self.lookups += 1
+        future = self.pending.get(key)
+        if future is None:
+            loop = asyncio.get_event_loop()
+            future = self.pending[key] = loop.create_future()
+            if len(self.pending) >= self.max_size:
+                self.flush()
+            elif self.timer is None:
+                self.timer = loop.call_later(self.window, self.flush)
+        # a cancelled waiter must not cancel the lookup for the others
+        return await asyncio.shield(future)
+
+    # send all collected lookups
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch = self.pending
+        self.pending = {}
+        if len(batch) > 0:
+            asyncio.ensure_future(self.resolve(batch))
+
+    async def resolve(self, batch):
+        self.requests += 1
+        try:
+            results = await self.fetch(list(batch))
+        except Exception as ex:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(ex)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
+
+
+class ChannelInfo:
+    """Cached youtube channel
+
+    `video_count` includes every video published up to `counted_until`,
+    it is kept up to date locally when videos are announced or deleted
+    until it is synced with youtube again after CHANNEL_COUNT_TTL."""
+
+    __slots__ = ("item", "video_count", "api_count", "counted_until", "fetched")
+
+    def __init__(self, item):
+        self.item = item
+        self.video_count = self.api_count = int(item["statistics"]["videoCount"])
+        self.counted_until = datetime.datetime.now(datetime.timezone.utc)
+        self.fetched = time.monotonic()
+
+    @property
+    def stale(self):
+        return time.monotonic() - self.fetched > CHANNEL_COUNT_TTL
+
+    @property
+    def thumbnail(self):
+        return self.item["snippet"]["thumbnails"]["default"]["url"]
+
+
+class YoutubeLookup:
+    """Batched lookups of youtube videos and channels
+
+    Channels are cached, most notifications don't need a channel lookup."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.videos = MicroBatcher(self.fetch_videos)
+        self.channels = MicroBatcher(self.fetch_channels)
+        self.channel_cache = TTLCache(CHANNEL_CACHE_SIZE, CHANNEL_CACHE_TTL)
+
+    async def fetch_videos(self, ids):
+        parsingChannelUrl = "https://www.googleapis.com/youtube/v3/videos"
+        parsingChannelQueryString = {"part": "snippet", "id": ",".join(ids), "maxResults": str(len(ids)),
+                                     "key": auth_token.google}
+        async with self.bot.session.get(parsingChannelUrl, params=parsingChannelQueryString) as resp:
+            v = await api_json(resp)
+        return {item["id"]: item for item in v.get("items", [])}
+
+    async def fetch_channels(self, ids):
+        parsingChannelUrl = "https://www.googleapis.com/youtube/v3/channels"
+        parsingChannelQueryString = {"part": "snippet,statistics", "id": ",".join(ids), "maxResults": str(len(ids)),
+                                     "key": auth_token.google}
+        async with self.bot.session.get(parsingChannelUrl, params=parsingChannelQueryString) as resp:
+            ch = await api_json(resp)
+        return {item["id"]: item for item in ch.get("items", [])}
+
+    # video resource with snippet, None if the video does not exist
+    # raises ApiError if the lookup failed
+    async def video(self, video_id):
+        return await self.videos.get(video_id)
+
+    # fetch a channel and cache it, None if the channel does not exist
+    async def channel(self, channel_id):
+        item = await self.channels.get(channel_id)
+        if item is None:
+            return None
+        info = ChannelInfo(item)
+        self.channel_cache.set(channel_id, info)
+        return info
+
+    # channel from the cache, None if it is not cached or its video count is due to be synced
+    def cached_channel(self, channel_id):
+        info = self.channel_cache.get(channel_id)
+        if info is None or info.stale:
+            return None
+        return info
+
+
+class TwitchLookup:
+    """Batched and cached lookups of twitch users and games"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.users = MicroBatcher(
+            self.fetch_users, max_size=TWITCH_BATCH_SIZE)
+        self.games = MicroBatcher(
+            self.fetch_games, max_size=TWITCH_BATCH_SIZE)
+        self.user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+        self.game_cache = TTLCache(GAME_CACHE_SIZE, GAME_CACHE_TTL)
+
+    async def fetch(self, url, ids):
+        parsingChannelHeader = {'Client-ID': auth_token.twitch_id,
+                                "Authorization": "Bearer " + auth_token.twitch_token}
+        parsingChannelQueryString = [("id", i) for i in ids]
+        async with self.bot.session.get(url, headers=parsingChannelHeader, params=parsingChannelQueryString) as resp:
+            obj = await api_json(resp)
+        return {item["id"]: item for item in obj.get("data", [])}
+
+    async def fetch_users(self, ids):
+        return await self.fetch("https://api.twitch.tv/helix/users", ids)
+
+    async def fetch_games(self, ids):
+        return await self.fetch("https://api.twitch.tv/helix/games", ids)
+
+    # user data, None if the user does not exist
+    async def user(self, user_id):
+        item = self.user_cache.get(user_id)
+        if item is None:
+            item = await self.users.get(user_id)
+            if item is not None:
+                self.user_cache.set(user_id, item)
+        return item
+
+    # game data with name and box art url, None if there is no such game
+    async def game(self, game_id):
+        if not game_id:
+            return None
+        item = self.game_cache.get(game_id)
+        if item is None:
+            item = await self.games.get(game_id)
+            if item is not None:
+                self.game_cache.set(game_id, item)
+        return item
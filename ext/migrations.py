@@ -0,0 +1,205 @@
+import json
+import sys
+import traceback
+
+from ext.repository import QUERIES
+
+
+# versions applied so far
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS SchemaMigrations (
+    Version INTEGER PRIMARY KEY,
+    Applied TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+# changes to the schema, a migration is applied once in its own transaction
+# its version is its position in the list, so new migrations are only ever appended
+MIGRATIONS = [
+    # 1: tables of the outbox, the webhook leases and the surrender@20 post updates
+    # they were created by the extensions themselves before
+    """
+    CREATE TABLE IF NOT EXISTS OutboundMessages (
+        ID BIGSERIAL PRIMARY KEY,
+        Guild BIGINT,
+        Channel BIGINT NOT NULL,
+        Content TEXT,
+        Embed TEXT,
+        Tag VARCHAR,
+        Data TEXT,
+        Attempts INTEGER NOT NULL DEFAULT 0,
+        NextAttempt TIMESTAMPTZ NOT NULL DEFAULT now(),
+        ClaimedUntil TIMESTAMPTZ,
+        DeadLetter BOOLEAN NOT NULL DEFAULT FALSE,
+        LastError TEXT
+    );
+    CREATE TABLE IF NOT EXISTS WebhookLeases (
+        Topic VARCHAR PRIMARY KEY,
+        Kind VARCHAR NOT NULL,
+        Source VARCHAR NOT NULL,
+        ExpiresAt TIMESTAMPTZ
+    );
+    CREATE TABLE IF NOT EXISTS Watermarks (
+        Name VARCHAR PRIMARY KEY,
+        Value VARCHAR NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS SurrenderAt20Posts (
+        ID VARCHAR PRIMARY KEY,
+        Embed TEXT NOT NULL,
+        Created TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    """,
+
+    # 2: columns of the surrender@20 subscriptions which the shipped schema lacks
+    """
+    ALTER TABLE SurrenderAt20Subscriptions
+        ADD COLUMN IF NOT EXISTS Other BOOLEAN NOT NULL DEFAULT FALSE,
+        ADD COLUMN IF NOT EXISTS LastPostID VARCHAR,
+        ADD COLUMN IF NOT EXISTS LastUpdated BIGINT NOT NULL DEFAULT 0,
+        ADD COLUMN IF NOT EXISTS Updates INTEGER NOT NULL DEFAULT 0,
+        ADD COLUMN IF NOT EXISTS LastPostChannel BIGINT,
+        ADD COLUMN IF NOT EXISTS LastPostMessage BIGINT;
+    """,
+
+    # 3: a guild is subscribed to a source only once, the subscription upserts rely on it
+    # the leading column of these indexes serves the lookups by source as well
+    """
+    DELETE FROM YoutubeSubscriptions a USING YoutubeSubscriptions b
+        WHERE a.ctid < b.ctid AND a.YoutubeChannel = b.YoutubeChannel AND a.Guild = b.Guild;
+    CREATE UNIQUE INDEX IF NOT EXISTS YoutubeSubscriptions_Channel_Guild ON YoutubeSubscriptions (YoutubeChannel, Guild);
+    DELETE FROM TwitchSubscriptions a USING TwitchSubscriptions b
+        WHERE a.ctid < b.ctid AND a.TwitchChannel = b.TwitchChannel AND a.Guild = b.Guild;
+    CREATE UNIQUE INDEX IF NOT EXISTS TwitchSubscriptions_Channel_Guild ON TwitchSubscriptions (TwitchChannel, Guild);
+    DELETE FROM SubredditSubscriptions a USING SubredditSubscriptions b
+        WHERE a.ctid < b.ctid AND a.Subreddit = b.Subreddit AND a.Guild = b.Guild;
+    CREATE UNIQUE INDEX IF NOT EXISTS SubredditSubscriptions_Subreddit_Guild ON SubredditSubscriptions (Subreddit, Guild);
+    """,
+
+    # 4: lookups by guild for the list commands and the cascading deletes,
+    # announced posts for the post updates and due messages for the outbox
+    """
+    CREATE INDEX IF NOT EXISTS YoutubeSubscriptions_Guild ON YoutubeSubscriptions (Guild);
+    CREATE INDEX IF NOT EXISTS TwitchSubscriptions_Guild ON TwitchSubscriptions (Guild);
+    CREATE INDEX IF NOT EXISTS SubredditSubscriptions_Guild ON SubredditSubscriptions (Guild);
+    CREATE INDEX IF NOT EXISTS Keywords_Guild ON Keywords (Guild);
+    CREATE INDEX IF NOT EXISTS SurrenderAt20Subscriptions_LastPostID ON SurrenderAt20Subscriptions (LastPostID);
+    CREATE INDEX IF NOT EXISTS OutboundMessages_Due ON OutboundMessages (NextAttempt) WHERE NOT DeadLetter;
+    """,
+
+    # 5: subscriptions and keywords are deleted together with their guild or source
+    # rows referring to guilds or sources which are already gone are removed first
+    """
+    DO $$
+    DECLARE
+        fk record;
+    BEGIN
+        FOR fk IN SELECT conrelid::regclass AS tbl, conname FROM pg_constraint
+                  WHERE contype = 'f' AND conrelid IN ('YoutubeSubscriptions'::regclass, 'TwitchSubscriptions'::regclass,
+                                                       'SubredditSubscriptions'::regclass, 'Keywords'::regclass,
+                                                       'SurrenderAt20Subscriptions'::regclass)
+        LOOP
+            EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', fk.tbl, fk.conname);
+        END LOOP;
+    END $$;
+
+    DELETE FROM YoutubeSubscriptions s WHERE NOT EXISTS (SELECT 1 FROM Guilds WHERE ID = s.Guild)
+        OR NOT EXISTS (SELECT 1 FROM YoutubeChannels WHERE ID = s.YoutubeChannel);
+    DELETE FROM TwitchSubscriptions s WHERE NOT EXISTS (SELECT 1 FROM Guilds WHERE ID = s.Guild)
+        OR NOT EXISTS (SELECT 1 FROM TwitchChannels WHERE ID = s.TwitchChannel);
+    DELETE FROM SubredditSubscriptions s WHERE NOT EXISTS (SELECT 1 FROM Guilds WHERE ID = s.Guild)
+        OR NOT EXISTS (SELECT 1 FROM Subreddits WHERE ID = s.Subreddit);
+    DELETE FROM Keywords k WHERE NOT EXISTS (SELECT 1 FROM Guilds WHERE ID = k.Guild);
+    DELETE FROM SurrenderAt20Subscriptions s WHERE NOT EXISTS (SELECT 1 FROM Guilds WHERE ID = s.Guild);
+
+    ALTER TABLE YoutubeSubscriptions
+        ADD CONSTRAINT YoutubeSubscriptions_Guild_fkey FOREIGN KEY (Guild) REFERENCES Guilds (ID) ON DELETE CASCADE,
+        ADD CONSTRAINT YoutubeSubscriptions_Channel_fkey FOREIGN KEY (YoutubeChannel)
+            REFERENCES YoutubeChannels (ID) ON DELETE CASCADE;
+    ALTER TABLE TwitchSubscriptions
+        ADD CONSTRAINT TwitchSubscriptions_Guild_fkey FOREIGN KEY (Guild) REFERENCES Guilds (ID) ON DELETE CASCADE,
+        ADD CONSTRAINT TwitchSubscriptions_Channel_fkey FOREIGN KEY (TwitchChannel)
+            REFERENCES TwitchChannels (ID) ON DELETE CASCADE;
+    ALTER TABLE SubredditSubscriptions
+        ADD CONSTRAINT SubredditSubscriptions_Guild_fkey FOREIGN KEY (Guild) REFERENCES Guilds (ID) ON DELETE CASCADE,
+        ADD CONSTRAINT SubredditSubscriptions_Subreddit_fkey FOREIGN KEY (Subreddit)
+            REFERENCES Subreddits (ID) ON DELETE CASCADE;
+    ALTER TABLE Keywords
+        ADD CONSTRAINT Keywords_Guild_fkey FOREIGN KEY (Guild) REFERENCES Guilds (ID) ON DELETE CASCADE;
+    ALTER TABLE SurrenderAt20Subscriptions
+        ADD CONSTRAINT SurrenderAt20Subscriptions_Guild_fkey FOREIGN KEY (Guild) REFERENCES Guilds (ID) ON DELETE CASCADE;
+    """,
+
+    # 6: the notification a queued message belongs to, to report when all of its messages are delivered
+    """
+    ALTER TABLE OutboundMessages
+        ADD COLUMN IF NOT EXISTS Notification VARCHAR,
+        ADD COLUMN IF NOT EXISTS Enqueued TIMESTAMPTZ NOT NULL DEFAULT now();
+    """,
+]
+
+# queries run by the commands and notification handlers which have to use an index
+# with example arguments to plan them with
+INDEXED_QUERIES = {
+    "youtube_subscriptions": (0,),
+    "twitch_subscriptions": (0,),
+    "reddit_subscriptions": (0,),
+    "keywords": (0,),
+    "surrenderat20_announcements": ([""],),
+    "unsubscribe_youtube": ("", 0),
+    "unsubscribe_twitch": ("", 0),
+    "unsubscribe_reddit": ("", 0),
+    "delete_orphaned_youtube_source": ("",),
+    "delete_orphaned_twitch_source": ("",),
+    "delete_orphaned_reddit_source": ("",),
+    "delete_guilds": ([0],),
+    "claim_outbound": (1, 1),
+}
+
+
+# bring the schema up to date
+async def migrate(repository):
+    async with repository.acquire() as db:
+        # the table of versions is created under the same lock as the migrations
+        async with db.transaction():
+            await db.lock_migrations()
+            await db.create_schema(SCHEMA)
+        for version, migration in enumerate(MIGRATIONS, 1):
+            async with db.transaction():
+                # another instance starting at the same time waits until the migration is done
+                await db.lock_migrations()
+                if await db.schema_version() >= version:
+                    continue
+                await db.create_schema(migration)
+                await db.add_schema_version(version)
+                print(f"Migrated the database to version {version}")
+
+
+# tables the queries of INDEXED_QUERIES are scanning sequentially
+# sequential scans are turned off while planning, the planner only uses them if there is no index to use
+async def sequential_scans(repository):
+    scans = []
+    async with repository.acquire() as db:
+        async with db.transaction():
+            await db.connection.execute("SET LOCAL enable_seqscan = off")
+            for name, args in INDEXED_QUERIES.items():
+                plan = json.loads(await db.explain(name, *args))
+                nodes = [plan[0]["Plan"]]
+                while len(nodes) > 0:
+                    node = nodes.pop()
+                    if node["Node Type"] == "Seq Scan":
+                        scans.append((name, node["Relation Name"]))
+                    nodes.extend(node.get("Plans", []))
+    return scans
+
+
+# warn about queries which would get slower the more guilds there are
+async def check_indexes(repository):
+    try:
+        scans = await sequential_scans(repository)
+    except Exception as ex:
+        print('Ignoring exception in check_indexes()', file=sys.stderr)
+        traceback.print_exception(
+            type(ex), ex, ex.__traceback__, file=sys.stderr)
+        return
+    for name, table in scans:
+        print(f"Query {name} scans {table} sequentially: {QUERIES[name]}", file=sys.stderr)
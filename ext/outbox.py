@@ -0,0 +1,195 @@
+import discord
+from discord.ext import commands, tasks
+
+from ext.delivery import DeliveryReport
+
+import datetime
+import json
+import sys
+import traceback
+
+
+# messages sent per second at most
+DRAIN_RATE = 50
+# seconds a claimed message is reserved for the worker before it can be claimed again
+CLAIM_TIMEOUT = 60
+# retries back off exponentially from RETRY_DELAY seconds up to MAX_RETRY_DELAY
+RETRY_DELAY = 5
+MAX_RETRY_DELAY = 30 * 60
+# messages failing this often are moved to the dead letters
+MAX_ATTEMPTS = 8
+# dead letters are deleted after this many seconds
+DEAD_LETTER_RETENTION = 7 * 24 * 60 * 60
+
+
+class Outbox(commands.Cog):
+    """Persistent queue for outgoing notifications
+
+    Notifications are stored in the database before they are sent, so they
+    survive restarts and failed sends. The worker claims due messages,
+    deletes them once they are sent, retries failures with exponential
+    backoff and keeps messages that can't be delivered as dead letters
+    for DEAD_LETTER_RETENTION seconds."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.hooks = {}  # tag -> coroutine called with [(data, guild, message)] after sending
+        self.progress = {}  # (notification, enqueue time) -> DeliveryReport of its messages done so far
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+
+        self.drain.start()
+        self.prune.start()
+
+    def cog_unload(self):
+        self.drain.cancel()
+        self.prune.cancel()
+
+    # store messages of a notification, given as (guild, channel id, content, embed), for sending
+    # the hook registered for the tag is called with data once they are sent
+    async def enqueue(self, name, messages, tag=None, data=None):
+        if data is not None:
+            data = json.dumps(data)
+        enqueued = datetime.datetime.now(datetime.timezone.utc)
+        rows = [(guild, channel, content, json.dumps(embed.to_dict()) if embed is not None else None, tag, data,
+                 name, enqueued)
+                for guild, channel, content, embed in messages]
+        if len(rows) == 0:
+            return
+        async with self.bot.repository.acquire() as db:
+            await db.add_outbound(rows)
+
+    def register_hook(self, tag, hook):
+        self.hooks[tag] = hook
+
+    @tasks.loop(seconds=1.0)
+    async def drain(self):
+        try:
+            await self.send_due()
+        except Exception as ex:
+            print('Ignoring exception in Outbox.drain()', file=sys.stderr)
+            traceback.print_exception(
+                type(ex), ex, ex.__traceback__, file=sys.stderr)
+
+    # claim the messages which are due and try to send them
+    async def send_due(self):
+        async with self.bot.repository.acquire() as db:
+            rows = await db.claim_outbound(DRAIN_RATE, CLAIM_TIMEOUT)
+        if len(rows) == 0:
+            return
+
+        messages = []
+        failures = {}
+        for row in rows:
+            channel = self.bot.get_channel(row[2])
+            if channel is None:
+                failures[row[0]] = (True, LookupError("Channel not found"))
+                continue
+            if row[4] is not None:
+                emb = discord.Embed.from_dict(json.loads(row[4]))
+            else:
+                emb = None
+            messages.append((row[0], channel, row[3], emb))
+
+        # the batch is made of messages of any notification, each notification is reported once it is done
+        report = await self.bot.delivery.deliver("Outbox", messages, record=False)
+
+        sent = []
+        for key, result in report.results.items():
+            if isinstance(result, Exception):
+                failures[key] = (self.is_permanent(result), result)
+            else:
+                sent.append(key)
+        sent_ids = set(sent)
+
+        attempts = {row[0]: row[7] + 1 for row in rows}
+        retries = []
+        dead = []
+        for key, (permanent, error) in failures.items():
+            if permanent or attempts[key] >= MAX_ATTEMPTS:
+                dead.append((key, attempts[key], repr(error)))
+            else:
+                delay = min(RETRY_DELAY * 2 ** (attempts[key] - 1),
+                            MAX_RETRY_DELAY)
+                retries.append((key, attempts[key], repr(error), delay))
+
+        async with self.bot.repository.acquire() as db:
+            async with db.transaction():
+                await db.delete_outbound(sent)
+                await db.retry_outbound(retries)
+                await db.bury_outbound(dead)
+            # notifications which have nothing left to send
+            queued = await db.queued_notifications(list({row[9] for row in rows}))
+
+        self.sent += len(sent)
+        self.retried += len(retries)
+        self.dead += len(dead)
+
+        # record the final result of every message with its notification
+        dead_ids = {key for key, _, _ in dead}
+        for row in rows:
+            if row[8] is None or (row[0] not in sent_ids and row[0] not in dead_ids):
+                continue
+            notification = (row[8], row[9])
+            progress = self.progress.get(notification)
+            if progress is None:
+                progress = self.progress[notification] = DeliveryReport(row[8])
+            if row[0] in sent_ids:
+                progress.results[row[0]] = report.results[row[0]]
+            else:
+                progress.results[row[0]] = failures[row[0]][1]
+        # and report the notifications which are done, from the time they were queued
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for notification in {(row[8], row[9]) for row in rows}:
+            if notification not in queued and notification in self.progress:
+                progress = self.progress.pop(notification)
+                progress.elapsed = (now - notification[1]).total_seconds()
+                self.bot.delivery.reports.append(progress)
+
+        # let the producers know about the sent messages, grouped by tag
+        hooked = {}
+        for row in rows:
+            if row[0] in sent_ids and row[5] in self.hooks:
+                data = json.loads(row[6]) if row[6] is not None else None
+                hooked.setdefault(row[5], []).append(
+                    (data, row[1], report.results[row[0]]))
+        for tag, results in hooked.items():
+            try:
+                await self.hooks[tag](results)
+            except Exception as ex:
+                print(f'Ignoring exception in Outbox hook {tag}', file=sys.stderr)
+                traceback.print_exception(
+                    type(ex), ex, ex.__traceback__, file=sys.stderr)
+
+    @drain.before_loop
+    async def before_drain(self):
+        await self.bot.wait_until_ready()
+
+    # delete old dead letters, missing permissions are common so they would pile up otherwise
+    @tasks.loop(hours=1.0)
+    async def prune(self):
+        try:
+            async with self.bot.repository.acquire() as db:
+                await db.prune_outbound(DEAD_LETTER_RETENTION)
+        except Exception as ex:
+            print('Ignoring exception in Outbox.prune()', file=sys.stderr)
+            traceback.print_exception(
+                type(ex), ex, ex.__traceback__, file=sys.stderr)
+
+    @prune.before_loop
+    async def before_prune(self):
+        await self.bot.wait_until_ready()
+
+    # errors which won't go away by trying again
+    @staticmethod
+    def is_permanent(ex):
+        if isinstance(ex, (discord.errors.Forbidden, discord.errors.NotFound)):
+            return True
+        if isinstance(ex, discord.errors.HTTPException):
+            return ex.status < 500 and ex.status != 429
+        return False
+
+
+def setup(bot):
+    bot.add_cog(Outbox(bot))
@@ -0,0 +1,95 @@
+import hashlib
+import re
+from collections import OrderedDict
+
+
+# html tags are removed from the post text
+CLEANR = re.compile('<.*?>')
+
+
+class PostAnalysis:
+    """Everything taken from the content of a surrender@20 post
+
+    It only depends on the post, so it is computed once and shared by
+    every server the post is sent to."""
+
+    __slots__ = ("hash", "text", "paragraphs", "lowered_paragraphs", "note", "image",
+                 "matches", "matches_version")
+
+    def __init__(self, content, content_hash=None):
+        self.hash = content_hash or PostAnalysis.hash_content(content)
+
+        brokentext = content.replace("<br />", "\n")
+        self.text = re.sub(CLEANR, '', brokentext).replace(
+            "&nbsp;", " ").replace("amp;", "")
+        self.paragraphs = self.text.split("\n")
+        self.lowered_paragraphs = self.text.lower().split("\n")
+
+        # a note in brackets at the beginning of the post
+        firstpart = " ".join(self.paragraphs[0:5])
+        start = firstpart.find("[")
+        end = firstpart.rfind("]")
+        self.note = firstpart[start:end + 1]
+
+        self.image = self.first_image(content)
+        self.matches = None
+        self.matches_version = None
+
+    @staticmethod
+    def hash_content(content):
+        return hashlib.sha1(content.encode()).hexdigest()
+
+    # source of the first image in the post, None if there is none
+    @staticmethod
+    def first_image(content):
+        startImgPos = content.find('<img')
+        if startImgPos == -1:
+            return None
+        startImgPos += 4
+        endImgPos = content.find('>', startImgPos)
+        imageTag = content[startImgPos:endImgPos]
+        if "'" in imageTag:
+            apostrophe = "'"
+        else:
+            apostrophe = '"'
+        startSrcPos = imageTag.find('src=' + apostrophe) + 5
+        endSrcPos = imageTag.find(apostrophe, startSrcPos)
+        return imageTag[startSrcPos:endSrcPos]
+
+    # keyword mentions of all servers, searched once until the keywords change
+    def keyword_matches(self, keywords):
+        if self.matches is None or self.matches_version != keywords.version:
+            self.matches = keywords.match_paragraphs(
+                self.paragraphs, self.lowered_paragraphs)
+            self.matches_version = keywords.version
+        return self.matches
+
+
+class PostCache:
+    """The analysis of the most recently used posts
+
+    An analysis is reused as long as the content of its post didn't change."""
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()  # post id -> PostAnalysis
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, post_id, content):
+        content_hash = PostAnalysis.hash_content(content)
+        analysis = self.entries.get(post_id)
+        if analysis is not None and analysis.hash == content_hash:
+            self.hits += 1
+            self.entries.move_to_end(post_id)
+            return analysis
+
+        self.misses += 1
+        analysis = self.entries[post_id] = PostAnalysis(content, content_hash)
+        self.entries.move_to_end(post_id)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return analysis
+
+    def __len__(self):
+        return len(self.entries)
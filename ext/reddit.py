@@ -1,332 +1,559 @@
-import discord
-from discord.ext import commands, tasks
-
-import datetime
-import asyncio
-import auth_token
-import traceback
-import sys
-
-
-class Reddit(commands.Cog):
-    """Add or remove subreddits to announce new posts of"""
-
-    def __init__(self, bot):
-        self.bot = bot
-
-        self.poll.start()
-
-    def cog_unload(self):
-        self.poll.cancel()
-
-    @tasks.loop(seconds=10.0)
-    async def poll(self):
-        async with self.bot.pool.acquire() as db:
-            # loop through all subreddits and check if a new post is up
-            subreddits = await db.fetch("SELECT * FROM Subreddits")
-            for row in subreddits:
-                parsingChannelUrl = f"https://www.reddit.com/r/{row[1]}/new.json"
-                parsingChannelHeader = {
-                    'cache-control': "no-cache", "User-Agent": auth_token.user_agent}
-                parsingChannelQueryString = {"sort": "new", "limit": "1"}
-                async with self.bot.session.get(parsingChannelUrl, headers=parsingChannelHeader,
-                                                params=parsingChannelQueryString) as resp:
-                    if resp.status > 400:
-                        await asyncio.sleep(10)
-                        continue
-
-                    try:
-                        submissions_obj = await resp.json()
-                    except Exception as ex:
-                        print(await resp.text())
-                        print('Ignoring exception in Reddit.poll()',
-                              file=sys.stderr)
-                        traceback.print_exception(
-                            type(ex), ex, ex.__traceback__, file=sys.stderr)
-                        await asyncio.sleep(1)
-                        continue
-
-                try:
-                    submission_data = submissions_obj["data"]["children"][0]["data"]
-                except Exception:
-                    await asyncio.sleep(1)
-                    continue
-
-                # new post found
-                if submission_data["id"] != row[2] and submission_data["created_utc"] > row[3]:
-
-                    # update last post data in database
-                    await db.execute("UPDATE Subreddits SET LastPostID=$1, LastPostTime=$2 WHERE ID=$3",
-                                     submission_data["id"], submission_data["created_utc"], row[0])
-
-                    # create message embed
-                    if len(submission_data["title"]) > 256:
-                        title = submission_data["title"][:256]
-                    else:
-                        title = submission_data["title"]
-                    emb = discord.Embed(title=title,
-                                        color=discord.Colour.dark_blue(),
-                                        url="https://www.reddit.com" + submission_data["permalink"])
-                    emb.timestamp = datetime.datetime.utcnow()
-                    emb.set_author(name=submission_data["author"])
-
-                    post_content = submission_data["selftext"].replace("amp;", "").replace(
-                        "&#x200B;", "").replace("&lt;", "<").replace("&gt;", ">")
-                    # if post content is very big, trim it
-                    if len(submission_data["selftext"]) > 1900:
-                        emb.description = post_content[:1900] + \
-                            "... `click title to continue`"
-                    else:
-                        emb.description = post_content
-
-                    try:
-                        emb.set_image(
-                            url=submission_data["preview"]["images"][0]["variants"]["gif"]["source"]["url"])
-                    except KeyError:
-                        try:
-                            if submission_data["thumbnail"] not in ["self", "default", "spoiler", "nsfw"]:
-                                if submission_data["over_18"]:
-                                    emb.set_image(
-                                        url=submission_data["preview"]["images"][0]["source"]["url"])
-                                else:
-                                    emb.set_image(
-                                        url=submission_data["thumbnail"])
-                            elif submission_data["over_18"] and submission_data["domain"] in ["i.imgur.com", "imgur.com", "i.redd.it", "gfycat.com"]:
-                                emb.set_image(url=submission_data["url"])
-                        except KeyError:
-                            pass
-
-                    # send notification to every subscribed server
-                    channels = await db.fetch("SELECT Guilds.RedditNotifChannel, Guilds.ID \
-                                                 FROM SubredditSubscriptions INNER JOIN Guilds \
-                                                 ON SubredditSubscriptions.Guild=Guilds.ID \
-                                                 WHERE Subreddit=$1", row[0])
-
-                    for ch in channels:
-                        announceChannel = self.bot.get_channel(ch[0])
-                        if announceChannel is None:
-                            continue
-                        if submission_data["over_18"] and not announceChannel.is_nsfw():
-                            try:
-                                emb.set_image(
-                                    url=submission_data["preview"]["images"][0]["variants"]["nsfw"]["source"]["url"].replace("amp;", ""))
-                            except KeyError:
-                                emb.set_image(
-                                    url="https://www.digitaltrends.com/wp-content/uploads/2012/11/reddit.jpeg")
-                            emb.set_footer(
-                                text="This is an NSFW post, to uncensor posts, please mark the notification channel as NSFW")
-                        try:
-                            await announceChannel.send("A new post in /r/" + row[1] + " !", embed=emb)
-                        except AttributeError:
-                            guild = self.bot.get_guild(ch[1])
-                            if guild is None:
-                                await db.execute("DELETE FROM SubredditSubscriptions WHERE Subreddit=$1 AND Guild=$2", ch[0], ch[1])
-                        except discord.errors.Forbidden:
-                            pass
-
-    @poll.before_loop
-    async def before_printer(self):
-        await self.bot.wait_until_ready()
-
-    # who and where the commands are permitted to use
-    @commands.has_permissions(manage_messages=True)
-    @commands.guild_only()
-    @commands.group(aliases=["rd"])
-    async def reddit(self, ctx):
-        """(Un)Subscribe to subreddits to announce"""
-        if ctx.invoked_subcommand is None:
-            await ctx.send("You need to specify an action \n(use 'help reddit' for more information)")
-
-    @reddit.command()
-    async def setchannel(self, ctx, channel=None):
-        """Sets the channel to announce Reddit posts in"""
-        # get channel obj, depending on if it was mentioned or just the name was specified
-        if len(ctx.message.channel_mentions) > 0:
-            channel_obj = ctx.message.channel_mentions[0]
-        elif channel is not None:
-            channel_obj = discord.utils.get(
-                ctx.guild.channels, name=channel.replace("#", ""))
-            if channel_obj is None:
-                await ctx.send(f"No channel named {channel}")
-                return
-        else:
-            await ctx.send("Missing channel parameter")
-            return
-
-        bot_member = ctx.guild.get_member(self.bot.user.id)
-        permissions = channel_obj.permissions_for(bot_member)
-        if not permissions.send_messages or not permissions.embed_links:
-            await ctx.send("Command failed, please make sure that the bot has both permissions for sending messages and using embeds in the specified channel!")
-            return
-
-        async with self.bot.pool.acquire() as db:
-            # add channel id for the guild to the database
-            await db.execute("UPDATE Guilds SET RedditNotifChannel=$1 WHERE ID=$2",
-                             channel_obj.id, ctx.guild.id)
-
-        await ctx.send("Successfully set Reddit notifications to " + channel_obj.mention)
-
-    @reddit.command(aliases=["sub"])
-    async def subscribe(self, ctx, *, subreddit=None):
-        """Subscribes to a subreddit
-
-        Its new posts will be announced in the specified channel"""
-        async with self.bot.pool.acquire() as db:
-            # check if announcement channel is set up
-            rows = await db.fetch("SELECT RedditNotifChannel FROM Guilds WHERE ID=$1", ctx.guild.id)
-            if len(rows) == 0 or rows[0][0] is None:
-                await ctx.send("You need to set up a notifications channel before subscribing! \nUse either ;setchannel or ;surrenderat20 setchannel")
-                return
-
-        if subreddit is None:
-            await ctx.send("You need to specify a subreddit to subscribe to")
-            return
-
-        sr = subreddit.replace("/r/", "").replace("r/", "")
-
-        # search for specified subreddit
-        parsingChannelUrl = f"https://www.reddit.com/subreddits/search.json?q={sr}&include_over_18=on"
-        parsingChannelHeader = {'cache-control': "no-cache"}
-        parsingChannelQueryString = {"limit": "1"}
-        async with self.bot.session.get(parsingChannelUrl, headers=parsingChannelHeader,
-                                        params=parsingChannelQueryString) as resp:
-            subreddits_obj = await resp.json()
-
-        if len(subreddits_obj["data"]["children"]) == 0:
-            await ctx.send(f"Could not find a subreddit called {sr}")
-            return
-
-        subreddit_data = subreddits_obj["data"]["children"][0]["data"]
-
-        if subreddit_data["display_name"].lower() != sr.lower():
-            name = subreddit_data["display_name"]
-            await ctx.send(f"Could not find subreddit called '{sr}'. \nDo you maybe mean '{name}'?")
-            return
-
-        announceChannel = self.bot.get_channel(rows[0][0])
-        if subreddit_data["over18"] and not announceChannel.is_nsfw():
-            await ctx.send("This subreddit is NSFW, to subscribe you need to set the announcement channel to NSFW")
-            return
-
-        # get last post data
-        parsingChannelUrl = f"https://www.reddit.com/r/{sr}/new.json"
-        parsingChannelHeader = {'cache-control': "no-cache"}
-        parsingChannelQueryString = {"sort": "new", "limit": "1"}
-        async with self.bot.session.get(parsingChannelUrl, headers=parsingChannelHeader,
-                                        params=parsingChannelQueryString) as resp:
-            submissions_obj = await resp.json()
-
-        submission_data = submissions_obj["data"]["children"][0]["data"]
-
-        async with self.bot.pool.acquire() as db:
-            # if subreddit is not yet in database, add it
-            results = await db.fetch("SELECT 1 FROM Subreddits WHERE ID=$1", submission_data["subreddit_id"])
-            if len(results) == 0:
-                await db.execute("INSERT INTO Subreddits (ID, Name, LastPostID, LastPostTime) VALUES ($1, $2, $3, $4)",
-                                 submission_data["subreddit_id"], submission_data["subreddit"],
-                                 submission_data["id"], submission_data["created_utc"])
-
-            # add subscription to database
-            results = await db.fetch("SELECT 1 FROM SubredditSubscriptions WHERE Subreddit=$1 AND Guild=$2",
-                                     submission_data["subreddit_id"], ctx.guild.id)
-            if len(results) == 0:
-                await db.execute("INSERT INTO SubredditSubscriptions (Subreddit, Guild) VALUES ($1, $2)",
-                                 submission_data["subreddit_id"], ctx.guild.id)
-            else:
-                await ctx.send("You are already subscribed to this Subreddit")
-                return
-
-        # create message embed and send it
-        emb = discord.Embed(title="Successfully subscribed to " + submission_data["subreddit_name_prefixed"],
-                            description=subreddit_data["public_description"], color=discord.Colour.green())
-        emb.set_thumbnail(url=subreddit_data["icon_img"])
-        emb.url = "https://www.reddit.com" + subreddit_data["url"]
-
-        await ctx.send(embed=emb)
-
-    @reddit.command(aliases=["unsub"])
-    async def unsubscribe(self, ctx, *, subreddit=None):
-        """Unsubscripes from a subreddit
-
-        New posts will no longer be announced"""
-        if subreddit is None:
-            await ctx.send("You need to spefify a subreddit to subscribe to")
-            return
-
-        sr = subreddit.replace("/r/", "").replace("r/", "")
-
-        # search subreddit
-        parsingChannelUrl = f"https://www.reddit.com/subreddits/search.json?q={sr}&include_over_18=on"
-        parsingChannelHeader = {'cache-control': "no-cache"}
-        parsingChannelQueryString = {"limit": "1"}
-        async with self.bot.session.get(parsingChannelUrl, headers=parsingChannelHeader,
-                                        params=parsingChannelQueryString) as resp:
-            subreddits_obj = await resp.json()
-
-        if len(subreddits_obj["data"]["children"]) == 0:
-            await ctx.send(f"Could not find a subreddit called {sr}")
-            return
-
-        subreddit_data = subreddits_obj["data"]["children"][0]["data"]
-
-        if subreddit_data["display_name"].lower() != sr.lower():
-            name = subreddit_data["display_name"]
-            await ctx.send(f"Could not find subreddit called '{sr}'. \nDo you maybe mean '{name}'?")
-            return
-
-        # get latest post data
-        parsingChannelUrl = f"https://www.reddit.com/r/{sr}/new.json"
-        parsingChannelHeader = {'cache-control': "no-cache"}
-        parsingChannelQueryString = {"sort": "new", "limit": "1"}
-        async with self.bot.session.get(parsingChannelUrl, headers=parsingChannelHeader,
-                                        params=parsingChannelQueryString) as resp:
-            submissions_obj = await resp.json()
-
-        submission_data = submissions_obj["data"]["children"][0]["data"]
-
-        async with self.bot.pool.acquire() as db:
-            # remove subscription from database
-            results = await db.fetch("SELECT 1 FROM SubredditSubscriptions WHERE Subreddit=$1 AND Guild=$2",
-                                     submission_data["subreddit_id"], ctx.guild.id)
-            if len(results) == 1:
-                await db.execute("DELETE FROM SubredditSubscriptions WHERE Subreddit=$1 AND Guild=$2",
-                                 submission_data["subreddit_id"], ctx.guild.id)
-            else:
-                await ctx.send("You are not subscribed to this Subreddit")
-                return
-
-            # remove subreddit from database if no server is subscribed to it anymore
-            results = await db.fetch("SELECT 1 FROM SubredditSubscriptions WHERE Subreddit=$1", submission_data["subreddit_id"])
-            if len(results) == 0:
-                await db.execute("DELETE FROM Subreddits WHERE ID=$1", submission_data["subreddit_id"])
-
-        # create message embed and send it
-        emb = discord.Embed(title="Successfully unsubscribed from " + submission_data["subreddit_name_prefixed"],
-                            description=subreddit_data["public_description"], color=discord.Colour.dark_red())
-        emb.set_thumbnail(url=subreddit_data["icon_img"])
-        emb.url = "https://www.reddit.com" + subreddit_data["url"]
-
-        await ctx.send(embed=emb)
-
-    @reddit.command(name="list")
-    async def _list(self, ctx):
-        """Displays a list of all subscribed subreddits"""
-        names = ""
-        async with self.bot.pool.acquire() as db:
-            # get all subreddits the server is subscribed to
-            cursor = await db.fetch("SELECT Subreddits.Name \
-                                       FROM SubredditSubscriptions INNER JOIN Subreddits \
-                                       ON SubredditSubscriptions.Subreddit=Subreddits.ID \
-                                       WHERE Guild=$1", ctx.guild.id)
-
-            for row in cursor:
-                names = names + row[0] + "\n"
-
-        # create message embed and send it
-        emb = discord.Embed(title="Subreddit subscriptions",
-                            color=discord.Colour.dark_blue(), description=names)
-        await ctx.send(embed=emb)
-
-
-def setup(bot):
-    bot.add_cog(Reddit(bot))
+import discord
+from discord.ext import commands, tasks
+
+import datetime
+import asyncio
+import heapq
+import time
+import auth_token
+import traceback
+import sys
+
+
+# maximum number of listing requests running at the same time
+POLL_CONCURRENCY = 8
+# number of subreddits combined into one listing request
+BATCH_SIZE = 25
+# number of posts requested per listing, 100 is the maximum reddit allows
+LISTING_LIMIT = 100
+# pages of a combined listing fetched at most before subreddits catch up one by one
+MAX_LISTING_PAGES = 3
+# bounds for the time between two checks of the same subreddit in seconds
+MIN_POLL_INTERVAL = 10
+MAX_POLL_INTERVAL = 15 * 60
+# how often a subreddit is checked within its average time between two posts
+POLLS_PER_GAP = 4
+# weight of the most recent gap between two posts in the moving average
+GAP_SMOOTHING = 0.3
+
+
+def callback(result):
+    if result.cancelled():
+        return
+    ex = result.exception()
+    if ex is not None:
+        traceback.print_exception(
+            type(ex), ex, ex.__traceback__, file=sys.stderr)
+
+
+class PollSchedule:
+    """Decides when each subreddit is checked next
+
+    Subreddits are polled relative to how often they get new posts,
+    busy ones are checked every cycle and inactive ones back off."""
+
+    def __init__(self):
+        self.heap = []  # (due time, subreddit id)
+        self.due = {}  # subreddit id -> due time of its current heap entry
+        self.gaps = {}  # subreddit id -> moving average of seconds between posts
+        self.last_post = {}  # subreddit id -> time of the newest known post
+        self.checked = {}  # subreddit id -> time up to which all posts have been seen
+
+    # add new subreddits and forget removed ones
+    def sync(self, rows, now):
+        ids = set()
+        for row in rows:
+            ids.add(row[0])
+            if row[0] not in self.due:
+                self.last_post[row[0]] = float(row[3])
+                self.push(row[0], now)
+
+        for subreddit_id in list(self.due):
+            if subreddit_id not in ids:
+                del self.due[subreddit_id]
+                self.gaps.pop(subreddit_id, None)
+                self.last_post.pop(subreddit_id, None)
+                self.checked.pop(subreddit_id, None)
+
+    def push(self, subreddit_id, due):
+        self.due[subreddit_id] = due
+        heapq.heappush(self.heap, (due, subreddit_id))
+
+    # take all subreddits which should be checked now
+    def pop_due(self, now):
+        ids = []
+        while len(self.heap) > 0 and self.heap[0][0] <= now:
+            due, subreddit_id = heapq.heappop(self.heap)
+            # entries of removed or rescheduled subreddits are skipped
+            if self.due.get(subreddit_id) == due:
+                ids.append(subreddit_id)
+        return ids
+
+    # update the average gap between posts with newly found post times
+    def record_posts(self, subreddit_id, times):
+        previous = self.last_post.get(subreddit_id)
+        for t in sorted(times):
+            if previous is not None and t > previous:
+                gap = t - previous
+                average = self.gaps.get(subreddit_id)
+                if average is None:
+                    self.gaps[subreddit_id] = gap
+                else:
+                    self.gaps[subreddit_id] = GAP_SMOOTHING * \
+                        gap + (1 - GAP_SMOOTHING) * average
+            previous = t
+        self.last_post[subreddit_id] = previous
+
+    # expected seconds until the next post of a subreddit
+    # the longer a subreddit stays quiet, the longer it gets
+    def gap(self, subreddit_id, now):
+        since = now - self.last_post.get(subreddit_id, now)
+        return max(self.gaps.get(subreddit_id, since), since)
+
+    def reschedule(self, subreddit_id, now):
+        if subreddit_id not in self.due:
+            return
+        gap = self.gap(subreddit_id, now)
+        interval = min(max(gap / POLLS_PER_GAP, MIN_POLL_INTERVAL),
+                       MAX_POLL_INTERVAL)
+        self.push(subreddit_id, now + interval)
+
+
+class Reddit(commands.Cog):
+    """Add or remove subreddits to announce new posts of"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+        # subreddits are fetched concurrently, new posts are handed over
+        # to a separate sender task so slow discord sends don't hold up polling
+        self.fetch_limiter = asyncio.Semaphore(POLL_CONCURRENCY)
+        self.send_queue = asyncio.Queue()
+        self.schedule = PollSchedule()
+        self.last_cycle = 0.0
+        self.last_checked = 0
+        self.sender = self.bot.loop.create_task(self.send_posts())
+        self.sender.add_done_callback(callback)
+
+        self.poll.start()
+
+    def cog_unload(self):
+        self.poll.cancel()
+        self.sender.cancel()
+
+    @tasks.loop(seconds=MIN_POLL_INTERVAL)
+    async def poll(self):
+        start = time.monotonic()
+        async with self.bot.repository.acquire() as db:
+            subreddits = await db.subreddits()
+
+        # only check the subreddits which are due
+        now = time.time()
+        self.schedule.sync(subreddits, now)
+        due = set(self.schedule.pop_due(now))
+        rows = [row for row in subreddits if row[0] in due]
+        # busy subreddits are batched together, so their posts don't push
+        # the posts of quiet subreddits out of the listing
+        rows.sort(key=lambda row: self.schedule.gap(row[0], now))
+
+        # check all batches at once, a cycle takes as long as the slowest request
+        batches = [rows[i:i + BATCH_SIZE]
+                   for i in range(0, len(rows), BATCH_SIZE)]
+        try:
+            await asyncio.gather(*[self.check_batch(batch) for batch in batches])
+        finally:
+            now = time.time()
+            for row in rows:
+                self.schedule.reschedule(row[0], now)
+
+        self.last_checked = len(rows)
+        self.last_cycle = time.monotonic() - start
+        if self.last_cycle > self.poll.seconds:
+            print(f"Reddit poll cycle took {self.last_cycle:.1f}s for {len(rows)} subreddits",
+                  file=sys.stderr)
+
+    # request a listing of new posts
+    # returns the list of posts or None on failure
+    # listings are not made conditional, the batches change with every poll so they would rarely be reused
+    async def fetch_listing(self, subreddit, params):
+        async with self.fetch_limiter:
+            parsingChannelUrl = f"https://www.reddit.com/r/{subreddit}/new.json"
+            parsingChannelHeader = {
+                'cache-control': "no-cache", "User-Agent": auth_token.user_agent}
+            try:
+                async with self.bot.session.get(parsingChannelUrl, params=params,
+                                                headers=parsingChannelHeader) as resp:
+                    if resp.status >= 400:
+                        return None
+                    submissions_obj = await resp.json()
+            except Exception as ex:
+                print('Ignoring exception in Reddit.poll()',
+                      file=sys.stderr)
+                traceback.print_exception(
+                    type(ex), ex, ex.__traceback__, file=sys.stderr)
+                return None
+
+        try:
+            return [child["data"] for child in submissions_obj["data"]["children"]]
+        except Exception:
+            return None
+
+    # check a batch of subreddits with one combined listing (r/a+b+c/new.json)
+    # and queue all posts made since the last check for sending
+    async def check_batch(self, rows):
+        started = time.time()
+        names = "+".join(row[1] for row in rows)
+        page = await self.fetch_listing(names, {"sort": "new", "limit": str(LISTING_LIMIT)})
+        if page is None:
+            return
+        posts = list(page)
+
+        # a full listing might not reach back to the last check of every subreddit,
+        # the following pages are fetched until it does
+        checked = min(self.schedule.checked.get(row[0], row[3]) for row in rows)
+        pages = 1
+        while len(page) >= LISTING_LIMIT and pages < MAX_LISTING_PAGES and \
+                min(submission_data["created_utc"] for submission_data in page) > checked:
+            page = await self.fetch_listing(names, {"sort": "new", "limit": str(LISTING_LIMIT),
+                                                    "after": "t3_" + page[-1]["id"]})
+            if page is None:
+                # the subreddits which are not covered catch up one by one
+                break
+            posts.extend(page)
+            pages += 1
+
+        # route posts back to their subreddits
+        by_subreddit = {}
+        for submission_data in posts:
+            by_subreddit.setdefault(
+                submission_data["subreddit_id"], []).append(submission_data)
+
+        # if the last page is full, older posts of the batch might not have fit into the listing
+        truncated_at = None
+        if page is None or len(page) >= LISTING_LIMIT:
+            truncated_at = min(
+                submission_data["created_utc"] for submission_data in posts)
+
+        cursors = []
+        for row in rows:
+            new_posts = [submission_data for submission_data in by_subreddit.get(row[0], [])
+                         if self.is_new(row, submission_data)]
+
+            # posts between the last check and the oldest post of the listing could be missing,
+            # before the first check since startup everything after the last announced post could be
+            checked = self.schedule.checked.get(row[0], row[3])
+            if truncated_at is not None and truncated_at > checked:
+                # catch up on everything after the last announced post
+                missed = await self.catch_up(row)
+                if missed is None:
+                    # try again on the next check
+                    continue
+                if len(missed) > 0:
+                    new_posts = missed
+            self.schedule.checked[row[0]] = started
+
+            if len(new_posts) == 0:
+                continue
+
+            # announce oldest first and move the cursor once to the newest post
+            new_posts.sort(key=self.post_order)
+            self.schedule.record_posts(
+                row[0], [float(submission_data["created_utc"]) for submission_data in new_posts])
+            for submission_data in new_posts:
+                await self.send_queue.put((row, submission_data))
+            cursors.append((new_posts[-1]["id"], new_posts[-1]["created_utc"], row[0]))
+
+        if len(cursors) == 0:
+            return
+
+        # update last post data in database
+        async with self.bot.repository.acquire() as db:
+            await db.set_subreddit_last_posts(cursors)
+
+    # fetch every post of a single subreddit since its last announced post
+    # returns None on failure
+    async def catch_up(self, row):
+        posts = await self.fetch_listing(row[1], {"sort": "new", "limit": str(LISTING_LIMIT),
+                                                  "before": "t3_" + row[2]})
+        if posts is None:
+            return None
+        return [submission_data for submission_data in posts
+                if self.is_new(row, submission_data)]
+
+    # posts are ordered by creation time and then by id, ids are base 36 numbers counting up
+    # so posts made within the same second as the last announced one are not lost
+    @staticmethod
+    def post_order(submission_data):
+        return submission_data["created_utc"], int(submission_data["id"], 36)
+
+    @classmethod
+    def is_new(cls, row, submission_data):
+        return cls.post_order(submission_data) > (row[3], int(row[2], 36))
+
+    # takes new posts from the queue and announces them
+    async def send_posts(self):
+        await self.bot.wait_until_ready()
+        while not self.bot.is_closed():
+            row, submission_data = await self.send_queue.get()
+            try:
+                await self.announce(row, submission_data)
+            except Exception as ex:
+                print('Ignoring exception in Reddit.send_posts()',
+                      file=sys.stderr)
+                traceback.print_exception(
+                    type(ex), ex, ex.__traceback__, file=sys.stderr)
+
+    # send a post to every subscribed server
+    async def announce(self, row, submission_data):
+        # create message embed
+        if len(submission_data["title"]) > 256:
+            title = submission_data["title"][:256]
+        else:
+            title = submission_data["title"]
+        emb = discord.Embed(title=title,
+                            color=discord.Colour.dark_blue(),
+                            url="https://www.reddit.com" + submission_data["permalink"])
+        emb.timestamp = datetime.datetime.utcnow()
+        emb.set_author(name=submission_data["author"])
+
+        post_content = submission_data["selftext"].replace("amp;", "").replace(
+            "&#x200B;", "").replace("&lt;", "<").replace("&gt;", ">")
+        # if post content is very big, trim it
+        if len(submission_data["selftext"]) > 1900:
+            emb.description = post_content[:1900] + \
+                "... `click title to continue`"
+        else:
+            emb.description = post_content
+
+        try:
+            emb.set_image(
+                url=submission_data["preview"]["images"][0]["variants"]["gif"]["source"]["url"])
+        except KeyError:
+            try:
+                if submission_data["thumbnail"] not in ["self", "default", "spoiler", "nsfw"]:
+                    if submission_data["over_18"]:
+                        emb.set_image(
+                            url=submission_data["preview"]["images"][0]["source"]["url"])
+                    else:
+                        emb.set_image(
+                            url=submission_data["thumbnail"])
+                elif submission_data["over_18"] and submission_data["domain"] in ["i.imgur.com", "imgur.com", "i.redd.it", "gfycat.com"]:
+                    emb.set_image(url=submission_data["url"])
+            except KeyError:
+                pass
+
+        # censored version for channels which are not marked as NSFW
+        nsfw_emb = None
+        if submission_data["over_18"]:
+            nsfw_emb = emb.copy()
+            try:
+                nsfw_emb.set_image(
+                    url=submission_data["preview"]["images"][0]["variants"]["nsfw"]["source"]["url"].replace("amp;", ""))
+            except KeyError:
+                nsfw_emb.set_image(
+                    url="https://www.digitaltrends.com/wp-content/uploads/2012/11/reddit.jpeg")
+            nsfw_emb.set_footer(
+                text="This is an NSFW post, to uncensor posts, please mark the notification channel as NSFW")
+
+        # send notification to every subscribed server
+        messages = []
+        for ch in self.bot.subscriptions.get("reddit", row[0]):
+            announceChannel = self.bot.get_channel(ch.channel)
+            if announceChannel is None:
+                guild = self.bot.get_guild(ch.guild)
+                if guild is None:
+                    async with self.bot.repository.acquire() as db:
+                        await db.delete_reddit_subscription(row[0], ch.guild)
+                    self.bot.subscriptions.unsubscribe(
+                        "reddit", row[0], ch.guild)
+                continue
+            if nsfw_emb is not None and not announceChannel.is_nsfw():
+                channel_emb = nsfw_emb
+            else:
+                channel_emb = emb
+            messages.append((ch.guild, announceChannel,
+                             "A new post in /r/" + row[1] + " !", channel_emb))
+
+        await self.bot.delivery.deliver("Reddit /r/" + row[1], messages)
+
+    @poll.before_loop
+    async def before_printer(self):
+        await self.bot.wait_until_ready()
+
+    # who and where the commands are permitted to use
+    @commands.has_permissions(manage_messages=True)
+    @commands.guild_only()
+    @commands.group(aliases=["rd"])
+    async def reddit(self, ctx):
+        """(Un)Subscribe to subreddits to announce"""
+        if ctx.invoked_subcommand is None:
+            await ctx.send("You need to specify an action \n(use 'help reddit' for more information)")
+
+    @reddit.command()
+    async def setchannel(self, ctx, channel=None):
+        """Sets the channel to announce Reddit posts in"""
+        # get channel obj, depending on if it was mentioned or just the name was specified
+        if len(ctx.message.channel_mentions) > 0:
+            channel_obj = ctx.message.channel_mentions[0]
+        elif channel is not None:
+            channel_obj = discord.utils.get(
+                ctx.guild.channels, name=channel.replace("#", ""))
+            if channel_obj is None:
+                await ctx.send(f"No channel named {channel}")
+                return
+        else:
+            await ctx.send("Missing channel parameter")
+            return
+
+        bot_member = ctx.guild.get_member(self.bot.user.id)
+        permissions = channel_obj.permissions_for(bot_member)
+        if not permissions.send_messages or not permissions.embed_links:
+            await ctx.send("Command failed, please make sure that the bot has both permissions for sending messages and using embeds in the specified channel!")
+            return
+
+        async with self.bot.repository.acquire() as db:
+            # add channel id for the guild to the database
+            await db.set_notif_channel("reddit", ctx.guild.id, channel_obj.id)
+        self.bot.subscriptions.set_channel(
+            ctx.guild.id, channel_obj.id, ["reddit"])
+
+        await ctx.send("Successfully set Reddit notifications to " + channel_obj.mention)
+
+    @reddit.command(aliases=["sub"])
+    async def subscribe(self, ctx, *, subreddit=None):
+        """Subscribes to a subreddit
+
+        Its new posts will be announced in the specified channel"""
+        async with self.bot.repository.acquire() as db:
+            # check if announcement channel is set up
+            notif_channel = await db.notif_channel("reddit", ctx.guild.id)
+            if notif_channel is None:
+                await ctx.send("You need to set up a notifications channel before subscribing! \nUse either ;setchannel or ;surrenderat20 setchannel")
+                return
+
+        if subreddit is None:
+            await ctx.send("You need to specify a subreddit to subscribe to")
+            return
+
+        sr = subreddit.replace("/r/", "").replace("r/", "")
+
+        # search for specified subreddit
+        parsingChannelUrl = f"https://www.reddit.com/subreddits/search.json?q={sr}&include_over_18=on"
+        parsingChannelHeader = {'cache-control': "no-cache"}
+        parsingChannelQueryString = {"limit": "1"}
+        async with self.bot.session.get(parsingChannelUrl, headers=parsingChannelHeader,
+                                        params=parsingChannelQueryString) as resp:
+            subreddits_obj = await resp.json()
+
+        if len(subreddits_obj["data"]["children"]) == 0:
+            await ctx.send(f"Could not find a subreddit called {sr}")
+            return
+
+        subreddit_data = subreddits_obj["data"]["children"][0]["data"]
+
+        if subreddit_data["display_name"].lower() != sr.lower():
+            name = subreddit_data["display_name"]
+            await ctx.send(f"Could not find subreddit called '{sr}'. \nDo you maybe mean '{name}'?")
+            return
+
+        announceChannel = self.bot.get_channel(notif_channel)
+        if subreddit_data["over18"] and not announceChannel.is_nsfw():
+            await ctx.send("This subreddit is NSFW, to subscribe you need to set the announcement channel to NSFW")
+            return
+
+        # get last post data
+        parsingChannelUrl = f"https://www.reddit.com/r/{sr}/new.json"
+        parsingChannelHeader = {'cache-control': "no-cache"}
+        parsingChannelQueryString = {"sort": "new", "limit": "1"}
+        async with self.bot.session.get(parsingChannelUrl, headers=parsingChannelHeader,
+                                        params=parsingChannelQueryString) as resp:
+            submissions_obj = await resp.json()
+
+        submission_data = submissions_obj["data"]["children"][0]["data"]
+
+        async with self.bot.repository.acquire() as db:
+            # add subscription to database, the subreddit is added if it is new
+            subscribed = await db.subscribe_reddit(ctx.guild.id, submission_data["subreddit_id"],
+                                                   submission_data["subreddit"], submission_data["id"],
+                                                   submission_data["created_utc"])
+        if not subscribed:
+            await ctx.send("You are already subscribed to this Subreddit")
+            return
+        self.bot.subscriptions.subscribe(
+            "reddit", submission_data["subreddit_id"], ctx.guild.id)
+
+        # create message embed and send it
+        emb = discord.Embed(title="Successfully subscribed to " + submission_data["subreddit_name_prefixed"],
+                            description=subreddit_data["public_description"], color=discord.Colour.green())
+        emb.set_thumbnail(url=subreddit_data["icon_img"])
+        emb.url = "https://www.reddit.com" + subreddit_data["url"]
+
+        await ctx.send(embed=emb)
+
+    @reddit.command(aliases=["unsub"])
+    async def unsubscribe(self, ctx, *, subreddit=None):
+        """Unsubscripes from a subreddit
+
+        New posts will no longer be announced"""
+        if subreddit is None:
+            await ctx.send("You need to spefify a subreddit to subscribe to")
+            return
+
+        sr = subreddit.replace("/r/", "").replace("r/", "")
+
+        # search subreddit
+        parsingChannelUrl = f"https://www.reddit.com/subreddits/search.json?q={sr}&include_over_18=on"
+        parsingChannelHeader = {'cache-control': "no-cache"}
+        parsingChannelQueryString = {"limit": "1"}
+        async with self.bot.session.get(parsingChannelUrl, headers=parsingChannelHeader,
+                                        params=parsingChannelQueryString) as resp:
+            subreddits_obj = await resp.json()
+
+        if len(subreddits_obj["data"]["children"]) == 0:
+            await ctx.send(f"Could not find a subreddit called {sr}")
+            return
+
+        subreddit_data = subreddits_obj["data"]["children"][0]["data"]
+
+        if subreddit_data["display_name"].lower() != sr.lower():
+            name = subreddit_data["display_name"]
+            await ctx.send(f"Could not find subreddit called '{sr}'. \nDo you maybe mean '{name}'?")
+            return
+
+        # get latest post data
+        parsingChannelUrl = f"https://www.reddit.com/r/{sr}/new.json"
+        parsingChannelHeader = {'cache-control': "no-cache"}
+        parsingChannelQueryString = {"sort": "new", "limit": "1"}
+        async with self.bot.session.get(parsingChannelUrl, headers=parsingChannelHeader,
+                                        params=parsingChannelQueryString) as resp:
+            submissions_obj = await resp.json()
+
+        submission_data = submissions_obj["data"]["children"][0]["data"]
+
+        async with self.bot.repository.acquire() as db:
+            # remove subscription from database
+            # the subreddit is removed as well if no server is subscribed to it anymore
+            unsubscribed, _ = await db.unsubscribe_reddit(ctx.guild.id, submission_data["subreddit_id"])
+        if not unsubscribed:
+            await ctx.send("You are not subscribed to this Subreddit")
+            return
+        self.bot.subscriptions.unsubscribe(
+            "reddit", submission_data["subreddit_id"], ctx.guild.id)
+
+        # create message embed and send it
+        emb = discord.Embed(title="Successfully unsubscribed from " + submission_data["subreddit_name_prefixed"],
+                            description=subreddit_data["public_description"], color=discord.Colour.dark_red())
+        emb.set_thumbnail(url=subreddit_data["icon_img"])
+        emb.url = "https://www.reddit.com" + subreddit_data["url"]
+
+        await ctx.send(embed=emb)
+
+    @reddit.command(name="list")
+    async def _list(self, ctx):
+        """Displays a list of all subscribed subreddits"""
+        names = ""
+        async with self.bot.repository.acquire() as db:
+            # get all subreddits the server is subscribed to
+            cursor = await db.reddit_subscriptions(ctx.guild.id)
+
+            for row in cursor:
+                names = names + row[0] + "\n"
+
+        # create message embed and send it
+        emb = discord.Embed(title="Subreddit subscriptions",
+                            color=discord.Colour.dark_blue(), description=names)
+        await ctx.send(embed=emb)
+
+
+def setup(bot):
+    bot.add_cog(Reddit(bot))
@@ -0,0 +1,497 @@
+import asyncpg
+import contextlib
+import time
+
+from ext.subscriptions import CHANNEL_COLUMNS
+
+
+# statements kept prepared per connection, enough for every query below
+STATEMENT_CACHE_SIZE = 256
+
+# every query of the bot by name
+QUERIES = {
+    # migrations, the lock key is arbitrary but has to stay the same
+    "lock_migrations": "SELECT pg_advisory_xact_lock(736453)",
+    "schema_version": "SELECT coalesce(max(Version), 0) FROM SchemaMigrations",
+    "add_schema_version": "INSERT INTO SchemaMigrations (Version) VALUES ($1)",
+
+    # guilds
+    "add_guild": "INSERT INTO Guilds (ID, Name) VALUES ($1, $2)",
+    "guilds": "SELECT ID, Name FROM Guilds",
+    "guild_channels": "SELECT ID, Name, SurrenderAt20NotifChannel, TwitchNotifChannel, "
+                      "YoutubeNotifChannel, RedditNotifChannel FROM Guilds",
+    "notif_channels": "SELECT ID, SurrenderAt20NotifChannel, TwitchNotifChannel, "
+                      "YoutubeNotifChannel, RedditNotifChannel FROM Guilds",
+    # subscriptions and keywords of the guilds are deleted by the cascading foreign keys
+    "delete_guilds": "DELETE FROM Guilds WHERE ID = ANY($1::bigint[])",
+    "set_notif_channels": "UPDATE Guilds SET SurrenderAt20NotifChannel=$1, TwitchNotifChannel=$1, "
+                          "YoutubeNotifChannel=$1, RedditNotifChannel=$1 WHERE ID=$2",
+
+    # subscriptions of all guilds
+    "all_youtube_subscriptions": "SELECT YoutubeChannel, Guild, OnlyStreams FROM YoutubeSubscriptions",
+    "all_twitch_subscriptions": "SELECT TwitchChannel, Guild FROM TwitchSubscriptions",
+    "all_reddit_subscriptions": "SELECT Subreddit, Guild FROM SubredditSubscriptions",
+    "all_surrenderat20_subscriptions": "SELECT Guild, RedPosts, PBE, Rotations, Esports, Releases, Other "
+                                       "FROM SurrenderAt20Subscriptions",
+    "all_keywords": "SELECT Guild, Keyword FROM Keywords",
+
+    # youtube
+    "subscribe_youtube": "WITH channel AS (INSERT INTO YoutubeChannels (ID, Name, LastLive, LastVideoID, VideoCount) "
+                         "VALUES ($1, $2, $3, $4, $5) "
+                         "ON CONFLICT (ID) DO UPDATE SET Name=EXCLUDED.Name) "
+                         "INSERT INTO YoutubeSubscriptions (YoutubeChannel, Guild, OnlyStreams) VALUES ($1, $6, $7) "
+                         "ON CONFLICT (YoutubeChannel, Guild) DO NOTHING RETURNING 1",
+    "unsubscribe_youtube": "DELETE FROM YoutubeSubscriptions WHERE YoutubeChannel=$1 AND Guild=$2 RETURNING 1",
+    "delete_youtube_subscription": "DELETE FROM YoutubeSubscriptions WHERE YoutubeChannel=$1 AND Guild=$2",
+    "youtube_subscriptions": "SELECT YoutubeChannels.Name, YoutubeSubscriptions.OnlyStreams "
+                             "FROM YoutubeSubscriptions INNER JOIN YoutubeChannels "
+                             "ON YoutubeSubscriptions.YoutubeChannel=YoutubeChannels.ID "
+                             "WHERE Guild=$1",
+    "youtube_last_live": "SELECT LastLive FROM YoutubeChannels WHERE ID=$1",
+    "set_youtube_last_live": "UPDATE YoutubeChannels SET LastLive=$1 WHERE ID=$2",
+    "youtube_last_video": "SELECT LastVideoID, VideoCount FROM YoutubeChannels WHERE ID=$1",
+    "set_youtube_last_video": "UPDATE YoutubeChannels SET LastVideoID=$1, VideoCount=$2 WHERE ID=$3",
+    "set_youtube_video_count": "UPDATE YoutubeChannels SET VideoCount=$1 WHERE ID=$2",
+
+    # twitch
+    "subscribe_twitch": "WITH channel AS (INSERT INTO TwitchChannels (ID, Name, LastLive) VALUES ($1, $2, $3) "
+                        "ON CONFLICT (ID) DO UPDATE SET Name=EXCLUDED.Name) "
+                        "INSERT INTO TwitchSubscriptions (TwitchChannel, Guild) VALUES ($1, $4) "
+                        "ON CONFLICT (TwitchChannel, Guild) DO NOTHING RETURNING 1",
+    "unsubscribe_twitch": "DELETE FROM TwitchSubscriptions WHERE TwitchChannel=$1 AND Guild=$2 RETURNING 1",
+    "twitch_subscriptions": "SELECT TwitchChannels.Name "
+                            "FROM TwitchSubscriptions INNER JOIN TwitchChannels "
+                            "ON TwitchSubscriptions.TwitchChannel=TwitchChannels.ID "
+                            "WHERE Guild=$1",
+    "twitch_last_live": "SELECT LastLive FROM TwitchChannels WHERE ID=$1",
+    "set_twitch_last_live": "UPDATE TwitchChannels SET LastLive=$1 WHERE ID=$2",
+
+    # reddit
+    "subreddits": "SELECT ID, Name, LastPostID, LastPostTime FROM Subreddits",
+    "set_subreddit_last_post": "UPDATE Subreddits SET LastPostID=$1, LastPostTime=$2 WHERE ID=$3",
+    "subscribe_reddit": "WITH subreddit AS (INSERT INTO Subreddits (ID, Name, LastPostID, LastPostTime) "
+                        "VALUES ($1, $2, $3, $4) "
+                        "ON CONFLICT (ID) DO UPDATE SET Name=EXCLUDED.Name) "
+                        "INSERT INTO SubredditSubscriptions (Subreddit, Guild) VALUES ($1, $5) "
+                        "ON CONFLICT (Subreddit, Guild) DO NOTHING RETURNING 1",
+    "unsubscribe_reddit": "DELETE FROM SubredditSubscriptions WHERE Subreddit=$1 AND Guild=$2 RETURNING 1",
+    "delete_reddit_subscription": "DELETE FROM SubredditSubscriptions WHERE Subreddit=$1 AND Guild=$2",
+    "reddit_subscriptions": "SELECT Subreddits.Name "
+                            "FROM SubredditSubscriptions INNER JOIN Subreddits "
+                            "ON SubredditSubscriptions.Subreddit=Subreddits.ID "
+                            "WHERE Guild=$1",
+
+    # surrender@20
+    "surrenderat20_subscription": "SELECT Guild, RedPosts, PBE, Rotations, Esports, Releases, Other "
+                                  "FROM SurrenderAt20Subscriptions WHERE Guild=$1",
+    "add_surrenderat20_subscription": "INSERT INTO SurrenderAt20Subscriptions "
+                                      "(Guild, RedPosts, PBE, Rotations, Esports, Releases, Other) "
+                                      "VALUES ($1, $2, $3, $4, $5, $6, $7)",
+    "set_surrenderat20_categories": "UPDATE SurrenderAt20Subscriptions "
+                                    "SET RedPosts=$2, PBE=$3, Rotations=$4, Esports=$5, Releases=$6, Other=$7 "
+                                    "WHERE Guild=$1",
+    "delete_surrenderat20_subscription": "DELETE FROM SurrenderAt20Subscriptions WHERE Guild=$1",
+    "set_surrenderat20_other": "UPDATE SurrenderAt20Subscriptions SET Other=$1 WHERE Guild=$2",
+    "set_surrenderat20_last_post": "UPDATE SurrenderAt20Subscriptions "
+                                   "SET LastPostID=$1, LastUpdated=$2, Updates=$3, LastPostChannel=$4, "
+                                   "LastPostMessage=$5 WHERE Guild=$6",
+    "surrenderat20_announcements": "SELECT Guild, LastPostID, LastUpdated, Updates, LastPostChannel, LastPostMessage "
+                                   "FROM SurrenderAt20Subscriptions WHERE LastPostID = ANY($1::varchar[])",
+    "set_surrenderat20_updates": "UPDATE SurrenderAt20Subscriptions SET LastUpdated=$1, Updates=$2 WHERE Guild=$3",
+    "keyword_exists": "SELECT 1 FROM Keywords WHERE Keyword=$1 AND Guild=$2",
+    "add_keyword": "INSERT INTO Keywords (Keyword, Guild) VALUES ($1, $2)",
+    "delete_keyword": "DELETE FROM Keywords WHERE Keyword=$1 AND Guild=$2",
+    "keywords": "SELECT Keyword FROM Keywords WHERE Guild=$1",
+    "post_embeds": "SELECT ID, Embed FROM SurrenderAt20Posts WHERE ID = ANY($1::varchar[])",
+    "store_post_embed": "INSERT INTO SurrenderAt20Posts (ID, Embed) VALUES ($1, $2) "
+                        "ON CONFLICT (ID) DO UPDATE SET Embed=$2",
+    "prune_post_embeds": "DELETE FROM SurrenderAt20Posts "
+                         "WHERE Created < now() - $1 * interval '1 second' "
+                         "AND ID NOT IN (SELECT LastPostID FROM SurrenderAt20Subscriptions "
+                         "WHERE LastPostID IS NOT NULL)",
+    "watermark": "SELECT Value FROM Watermarks WHERE Name=$1",
+    "set_watermark": "INSERT INTO Watermarks (Name, Value) VALUES ($1, $2) "
+                     "ON CONFLICT (Name) DO UPDATE SET Value=$2",
+
+    # webhook leases
+    "leases": "SELECT Topic, ExpiresAt FROM WebhookLeases",
+    "keep_leases": "DELETE FROM WebhookLeases WHERE Topic <> ALL($1::varchar[])",
+    "add_lease": "INSERT INTO WebhookLeases (Topic, Kind, Source) VALUES ($1, $2, $3) "
+                 "ON CONFLICT (Topic) DO NOTHING",
+    "delete_lease": "DELETE FROM WebhookLeases WHERE Topic=$1",
+    "set_lease_expiry": "UPDATE WebhookLeases SET ExpiresAt=$1 WHERE Topic=$2",
+
+    # outbox
+    "add_outbound": "INSERT INTO OutboundMessages (Guild, Channel, Content, Embed, Tag, Data, Notification, Enqueued) "
+                    "VALUES ($1, $2, $3, $4, $5, $6, $7, $8)",
+    "claim_outbound": "UPDATE OutboundMessages "
+                      "SET ClaimedUntil=now() + $2 * interval '1 second' "
+                      "WHERE ID IN (SELECT ID FROM OutboundMessages "
+                      "WHERE NOT DeadLetter AND NextAttempt <= now() "
+                      "AND (ClaimedUntil IS NULL OR ClaimedUntil < now()) "
+                      "ORDER BY ID LIMIT $1 FOR UPDATE SKIP LOCKED) "
+                      "RETURNING ID, Guild, Channel, Content, Embed, Tag, Data, Attempts, Notification, Enqueued",
+    "delete_outbound": "DELETE FROM OutboundMessages WHERE ID = ANY($1::bigint[])",
+    "retry_outbound": "UPDATE OutboundMessages "
+                      "SET Attempts=$2, LastError=$3, ClaimedUntil=NULL, "
+                      "NextAttempt=now() + $4 * interval '1 second' "
+                      "WHERE ID=$1",
+    "bury_outbound": "UPDATE OutboundMessages "
+                     "SET Attempts=$2, LastError=$3, ClaimedUntil=NULL, DeadLetter=TRUE, NextAttempt=now() "
+                     "WHERE ID=$1",
+    "queued_notifications": "SELECT DISTINCT Notification, Enqueued FROM OutboundMessages "
+                            "WHERE NOT DeadLetter AND Enqueued = ANY($1::timestamptz[])",
+    "prune_outbound": "DELETE FROM OutboundMessages "
+                      "WHERE DeadLetter AND NextAttempt < now() - $1 * interval '1 second'",
+}
+
+# removing the source of a subscription once nobody is subscribed to it anymore
+# the source is locked first, so a subscription added at the same time is either seen or waits for the removal
+# and the last two subscriptions removed at the same time are removed one after another
+for kind, (table, column, source) in {"youtube": ("YoutubeSubscriptions", "YoutubeChannel", "YoutubeChannels"),
+                                      "twitch": ("TwitchSubscriptions", "TwitchChannel", "TwitchChannels"),
+                                      "reddit": ("SubredditSubscriptions", "Subreddit", "Subreddits")}.items():
+    QUERIES["lock_" + kind + "_source"] = f"SELECT 1 FROM {source} WHERE ID=$1 FOR UPDATE"
+    QUERIES["delete_orphaned_" + kind + "_source"] = f"DELETE FROM {source} WHERE ID=$1 " \
+                                                     f"AND NOT EXISTS (SELECT 1 FROM {table} WHERE {column}=$1) " \
+                                                     f"RETURNING 1"
+
+# the notification channel of a guild for every source
+for kind, column in CHANNEL_COLUMNS.items():
+    QUERIES[kind + "_channel"] = f"SELECT {column} FROM Guilds WHERE ID=$1"
+    QUERIES["set_" + kind + "_channel"] = f"UPDATE Guilds SET {column}=$1 WHERE ID=$2"
+
+
+class QueryStats:
+    """Number of calls and time spent running a query"""
+
+    __slots__ = ("calls", "total", "slowest")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.slowest = 0.0
+
+    def record(self, duration):
+        self.calls += 1
+        self.total += duration
+        self.slowest = max(self.slowest, duration)
+
+    @property
+    def average(self):
+        return self.total / self.calls if self.calls else 0.0
+
+
+class Repository:
+    """Owns the connection pool and every query of the bot
+
+    Queries are prepared the first time they run on a connection and stay
+    prepared for as long as the connection lives, a connection which
+    replaces a lost one prepares them anew. Calls and latency are recorded
+    per query."""
+
+    def __init__(self):
+        self.pool = None
+        self.stats = {name: QueryStats() for name in QUERIES}
+
+    async def connect(self, **kwargs):
+        # statements are never evicted, there are only as many as there are queries
+        self.pool = await asyncpg.create_pool(statement_cache_size=STATEMENT_CACHE_SIZE,
+                                              max_cached_statement_lifetime=0, **kwargs)
+        return self.pool
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        async with self.pool.acquire() as connection:
+            yield Session(self, connection)
+
+    # the queries with the most time spent on them
+    def slowest(self, count=5):
+        used = [(name, stats) for name, stats in self.stats.items() if stats.calls]
+        return sorted(used, key=lambda item: item[1].total, reverse=True)[:count]
+
+
+class Session:
+    """A pooled connection with a method for every query"""
+
+    def __init__(self, repository, connection):
+        self.repository = repository
+        self.connection = connection
+
+    def transaction(self):
+        return self.connection.transaction()
+
+    # schema changes made by the migrations, these are not prepared
+    async def create_schema(self, schema):
+        await self.connection.execute(schema)
+
+    # the plan of a query as json
+    async def explain(self, name, *args):
+        return await self.connection.fetchval("EXPLAIN (FORMAT JSON) " + QUERIES[name], *args)
+
+    # run a query with the connection method of the same name
+    async def run(self, method, name, *args):
+        start = time.perf_counter()
+        try:
+            return await getattr(self.connection, method)(QUERIES[name], *args)
+        finally:
+            self.repository.stats[name].record(time.perf_counter() - start)
+
+    async def exists(self, name, *args):
+        return await self.run("fetchval", name, *args) is not None
+
+    # migrations
+
+    async def lock_migrations(self):
+        await self.run("execute", "lock_migrations")
+
+    async def schema_version(self):
+        return await self.run("fetchval", "schema_version")
+
+    async def add_schema_version(self, version):
+        await self.run("execute", "add_schema_version", version)
+
+    # guilds
+
+    async def add_guild(self, guild, name):
+        await self.run("execute", "add_guild", guild, name)
+
+    async def guilds(self):
+        return await self.run("fetch", "guilds")
+
+    async def guild_channels(self):
+        return await self.run("fetch", "guild_channels")
+
+    # all data of the guilds which the bot left
+    async def delete_guilds(self, guilds):
+        await self.run("execute", "delete_guilds", guilds)
+
+    # differences between the Guilds table and the guilds, given as (id, name), the bot is on
+    # returns the guilds which are not stored yet, the stored guilds the bot is not on anymore
+    # and the number of stored guilds
+    async def guild_changes(self, guilds):
+        stored = {row[0]: row[1] for row in await self.run("fetch", "guilds")}
+        current = {guild for guild, name in guilds}
+        joined = [(guild, name) for guild, name in guilds if guild not in stored]
+        left = [(guild, name) for guild, name in stored.items() if guild not in current]
+        return joined, left, len(stored)
+
+    # add the joined and delete the left guilds, both given as (id, name)
+    async def apply_guild_changes(self, joined, left):
+        if len(joined) > 0:
+            await self.run("executemany", "add_guild", joined)
+        if len(left) > 0:
+            await self.delete_guilds([guild for guild, name in left])
+
+    # notification channel of a guild for a source, None if it isn't set up
+    async def notif_channel(self, kind, guild):
+        return await self.run("fetchval", kind + "_channel", guild)
+
+    async def set_notif_channel(self, kind, guild, channel):
+        await self.run("execute", "set_" + kind + "_channel", channel, guild)
+
+    async def set_notif_channels(self, guild, channel):
+        await self.run("execute", "set_notif_channels", channel, guild)
+
+    async def all_subscriptions(self):
+        return (await self.run("fetch", "notif_channels"),
+                await self.run("fetch", "all_youtube_subscriptions"),
+                await self.run("fetch", "all_twitch_subscriptions"),
+                await self.run("fetch", "all_reddit_subscriptions"),
+                await self.run("fetch", "all_surrenderat20_subscriptions"))
+
+    async def all_keywords(self):
+        return await self.run("fetch", "all_keywords")
+
+    # youtube
+
+    # subscribe a guild to a channel, the channel is added if it is new
+    # returns whether the guild wasn't subscribed already
+    async def subscribe_youtube(self, guild, channel, name, last_live, last_video, video_count, only_streams):
+        return await self.exists("subscribe_youtube", channel, name, last_live, last_video, video_count,
+                                 guild, only_streams)
+
+    # unsubscribe a guild from a source, the source is removed with its last subscription
+    # returns whether the guild was subscribed and whether the source was removed
+    async def unsubscribe(self, kind, guild, source):
+        async with self.transaction():
+            # subscribing locks the source as well, so the check for other subscriptions
+            # sees every subscription added or removed before
+            await self.run("execute", "lock_" + kind + "_source", source)
+            if not await self.exists("unsubscribe_" + kind, source, guild):
+                return False, False
+            return True, await self.exists("delete_orphaned_" + kind + "_source", source)
+
+    async def unsubscribe_youtube(self, guild, channel):
+        return await self.unsubscribe("youtube", guild, channel)
+
+    async def delete_youtube_subscription(self, channel, guild):
+        await self.run("execute", "delete_youtube_subscription", channel, guild)
+
+    async def youtube_subscriptions(self, guild):
+        return await self.run("fetch", "youtube_subscriptions", guild)
+
+    async def youtube_last_live(self, channel):
+        return await self.run("fetchval", "youtube_last_live", channel)
+
+    async def set_youtube_last_live(self, channel, last_live):
+        await self.run("execute", "set_youtube_last_live", last_live, channel)
+
+    # id of the newest video and the video count of a channel
+    async def youtube_last_video(self, channel):
+        return await self.run("fetchrow", "youtube_last_video", channel)
+
+    async def set_youtube_last_video(self, channel, video, video_count):
+        await self.run("execute", "set_youtube_last_video", video, video_count, channel)
+
+    async def set_youtube_video_count(self, channel, video_count):
+        await self.run("execute", "set_youtube_video_count", video_count, channel)
+
+    # twitch
+
+    # same as subscribe_youtube
+    async def subscribe_twitch(self, guild, channel, name, last_live):
+        return await self.exists("subscribe_twitch", channel, name, last_live, guild)
+
+    async def unsubscribe_twitch(self, guild, channel):
+        return await self.unsubscribe("twitch", guild, channel)
+
+    async def twitch_subscriptions(self, guild):
+        return await self.run("fetch", "twitch_subscriptions", guild)
+
+    async def twitch_last_live(self, channel):
+        return await self.run("fetchval", "twitch_last_live", channel)
+
+    async def set_twitch_last_live(self, channel, last_live):
+        await self.run("execute", "set_twitch_last_live", last_live, channel)
+
+    # reddit
+
+    async def subreddits(self):
+        return await self.run("fetch", "subreddits")
+
+    # cursors given as (last post id, last post time, subreddit)
+    async def set_subreddit_last_posts(self, cursors):
+        await self.run("executemany", "set_subreddit_last_post", cursors)
+
+    # same as subscribe_youtube
+    async def subscribe_reddit(self, guild, subreddit, name, last_post, last_post_time):
+        return await self.exists("subscribe_reddit", subreddit, name, last_post, last_post_time, guild)
+
+    async def unsubscribe_reddit(self, guild, subreddit):
+        return await self.unsubscribe("reddit", guild, subreddit)
+
+    async def delete_reddit_subscription(self, subreddit, guild):
+        await self.run("execute", "delete_reddit_subscription", subreddit, guild)
+
+    async def reddit_subscriptions(self, guild):
+        return await self.run("fetch", "reddit_subscriptions", guild)
+
+    # surrender@20
+
+    # the subscribed categories of a guild, None if it isn't subscribed
+    async def surrenderat20_subscription(self, guild):
+        return await self.run("fetchrow", "surrenderat20_subscription", guild)
+
+    async def add_surrenderat20_subscription(self, guild, categories):
+        await self.run("execute", "add_surrenderat20_subscription", guild, *categories)
+
+    async def set_surrenderat20_categories(self, guild, categories):
+        await self.run("execute", "set_surrenderat20_categories", guild, *categories)
+
+    async def delete_surrenderat20_subscription(self, guild):
+        await self.run("execute", "delete_surrenderat20_subscription", guild)
+
+    async def set_surrenderat20_other(self, guild, other):
+        await self.run("execute", "set_surrenderat20_other", other, guild)
+
+    # announcements given as (post, updated, updates, channel, message, guild)
+    async def set_surrenderat20_last_posts(self, announcements):
+        await self.run("executemany", "set_surrenderat20_last_post", announcements)
+
+    # guilds which were sent one of the posts, their message and the updates they have seen
+    async def surrenderat20_announcements(self, posts):
+        return await self.run("fetch", "surrenderat20_announcements", posts)
+
+    # updates given as (updated, number of updates, guild)
+    async def set_surrenderat20_updates(self, updates):
+        await self.run("executemany", "set_surrenderat20_updates", updates)
+
+    async def keyword_exists(self, guild, keyword):
+        return await self.exists("keyword_exists", keyword, guild)
+
+    async def add_keyword(self, guild, keyword):
+        await self.run("execute", "add_keyword", keyword, guild)
+
+    async def delete_keyword(self, guild, keyword):
+        await self.run("execute", "delete_keyword", keyword, guild)
+
+    async def keywords(self, guild):
+        return [row[0] for row in await self.run("fetch", "keywords", guild)]
+
+    async def post_embeds(self, posts):
+        return await self.run("fetch", "post_embeds", posts)
+
+    async def store_post_embed(self, post, embed):
+        await self.run("execute", "store_post_embed", post, embed)
+
+    # stored embeds older than the retention which no guild refers to anymore
+    async def prune_post_embeds(self, retention):
+        await self.run("execute", "prune_post_embeds", retention)
+
+    async def watermark(self, name):
+        return await self.run("fetchval", "watermark", name)
+
+    async def set_watermark(self, name, value):
+        await self.run("execute", "set_watermark", name, value)
+
+    # webhook leases
+
+    async def leases(self):
+        return await self.run("fetch", "leases")
+
+    # delete the leases of all other topics
+    async def keep_leases(self, topics):
+        await self.run("execute", "keep_leases", topics)
+
+    # leases given as (topic, kind, source), known topics are left as they are
+    async def add_leases(self, leases):
+        await self.run("executemany", "add_lease", leases)
+
+    async def add_lease(self, topic, kind, source):
+        await self.run("execute", "add_lease", topic, kind, source)
+
+    async def delete_lease(self, topic):
+        await self.run("execute", "delete_lease", topic)
+
+    async def set_lease_expiry(self, topic, expires):
+        await self.run("execute", "set_lease_expiry", expires, topic)
+
+    # outbox
+
+    # messages given as (guild, channel, content, embed, tag, data, notification, enqueued)
+    async def add_outbound(self, messages):
+        await self.run("executemany", "add_outbound", messages)
+
+    # claim up to `limit` messages which are due for `timeout` seconds
+    async def claim_outbound(self, limit, timeout):
+        return await self.run("fetch", "claim_outbound", limit, timeout)
+
+    async def delete_outbound(self, ids):
+        await self.run("execute", "delete_outbound", ids)
+
+    # retries given as (id, attempts, error, delay in seconds)
+    async def retry_outbound(self, retries):
+        await self.run("executemany", "retry_outbound", retries)
+
+    # dead letters given as (id, attempts, error)
+    async def bury_outbound(self, dead):
+        await self.run("executemany", "bury_outbound", dead)
+
+    # notifications, as (name, enqueue time), of the given enqueue times which still have messages to send
+    async def queued_notifications(self, enqueued):
+        return {(row[0], row[1]) for row in await self.run("fetch", "queued_notifications", enqueued)}
+
+    # dead letters buried longer ago than the retention in seconds
+    async def prune_outbound(self, retention):
+        await self.run("execute", "prune_outbound", retention)
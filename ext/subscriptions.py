@@ -0,0 +1,148 @@
+from collections import namedtuple
+
+
+# a guild that should be notified and the channel to notify it in
+Subscriber = namedtuple("Subscriber", ["guild", "channel", "flags"])
+
+# flags of youtube subscriptions
+ONLY_STREAMS = 1
+
+# notification channel column in the Guilds table for each source
+CHANNEL_COLUMNS = {"surrenderat20": "SurrenderAt20NotifChannel",
+                   "twitch": "TwitchNotifChannel",
+                   "youtube": "YoutubeNotifChannel",
+                   "reddit": "RedditNotifChannel"}
+
+# surrender@20 categories as used in the SurrenderAt20Subscriptions columns
+CATEGORIES = ["RedPosts", "PBE", "Rotations", "Esports", "Releases", "Other"]
+# bit of every category in the category mask of a guild
+CATEGORY_BITS = {category: 1 << i for i, category in enumerate(CATEGORIES)}
+
+
+class SubscriptionIndex:
+    """In memory copy of all subscriptions
+
+    Maps every source (youtube channel, twitch channel, subreddit,
+    surrender@20 category) to the guilds subscribed to it, so notifications
+    can be fanned out without querying the database.
+    Surrender@20 categories are kept as a bitmask per guild and a set of
+    guilds per category.
+    It is loaded once on startup and kept up to date by the commands."""
+
+    def __init__(self):
+        self.sources = {kind: {} for kind in CHANNEL_COLUMNS}  # kind -> source -> guild -> flags
+        self.channels = {}  # guild -> kind -> notification channel
+        self.category_masks = {}  # guild -> bitmask of surrender@20 categories
+        self.category_guilds = {category: set() for category in CATEGORIES}
+
+    async def load(self, repository):
+        async with repository.acquire() as db:
+            guilds, youtube, twitch, reddit, surrenderat20 = await db.all_subscriptions()
+
+        self.sources = {kind: {} for kind in CHANNEL_COLUMNS}
+        self.channels = {}
+        self.category_masks = {}
+        self.category_guilds = {category: set() for category in CATEGORIES}
+        for row in guilds:
+            self.channels[row[0]] = dict(zip(CHANNEL_COLUMNS, row[1:]))
+        for row in youtube:
+            self.subscribe("youtube", row[0], row[1],
+                           ONLY_STREAMS if row[2] else 0)
+        for row in twitch:
+            self.subscribe("twitch", row[0], row[1])
+        for row in reddit:
+            self.subscribe("reddit", row[0], row[1])
+        for row in surrenderat20:
+            self.set_categories(row[0], row[1:])
+
+    # all subscribers of a source, guilds which are not in the Guilds table are left out
+    def get(self, kind, source):
+        return self.get_many(kind, [source])
+
+    # subscribers of any of the given sources, every guild is only returned once
+    def get_many(self, kind, sources):
+        guilds = {}
+        for source in sources:
+            for guild, flags in self.sources[kind].get(source, {}).items():
+                guilds.setdefault(guild, flags)
+
+        subscribers = []
+        for guild, flags in guilds.items():
+            channels = self.channels.get(guild)
+            if channels is not None:
+                subscribers.append(Subscriber(guild, channels[kind], flags))
+        return subscribers
+
+    # notification channel of a guild for a source
+    def channel(self, guild, kind):
+        channels = self.channels.get(guild)
+        if channels is None:
+            return None
+        return channels[kind]
+
+    def subscribe(self, kind, source, guild, flags=0):
+        self.sources[kind].setdefault(source, {})[guild] = flags
+
+    def unsubscribe(self, kind, source, guild):
+        guilds = self.sources[kind].get(source)
+        if guilds is None:
+            return
+        guilds.pop(guild, None)
+        if len(guilds) == 0:
+            del self.sources[kind][source]
+
+    # guilds subscribed to any of the surrender@20 categories, flags are their category masks
+    def audience(self, categories):
+        guilds = set().union(*(self.category_guilds[category] for category in categories))
+
+        subscribers = []
+        for guild in guilds:
+            channels = self.channels.get(guild)
+            if channels is not None:
+                subscribers.append(Subscriber(
+                    guild, channels["surrenderat20"], self.category_masks[guild]))
+        return subscribers
+
+    # surrender@20 subscriptions are stored as one boolean per category
+    def set_categories(self, guild, values):
+        mask = 0
+        for category, value in zip(CATEGORIES, values):
+            if value:
+                mask |= CATEGORY_BITS[category]
+        self.set_category_mask(guild, mask)
+
+    def set_category_mask(self, guild, mask):
+        old = self.category_masks.pop(guild, 0)
+        if mask:
+            self.category_masks[guild] = mask
+        for category, bit in CATEGORY_BITS.items():
+            if mask & bit and not old & bit:
+                self.category_guilds[category].add(guild)
+            elif old & bit and not mask & bit:
+                self.category_guilds[category].discard(guild)
+
+    def add_guild(self, guild):
+        self.channels.setdefault(guild, dict.fromkeys(CHANNEL_COLUMNS))
+
+    def remove_guild(self, guild):
+        self.remove_guilds([guild])
+
+    # every source is only looked at once no matter how many guilds are removed
+    def remove_guilds(self, guilds):
+        guilds = set(guilds)
+        for guild in guilds:
+            self.channels.pop(guild, None)
+            self.set_category_mask(guild, 0)
+        for kind in self.sources:
+            for source, subscribers in list(self.sources[kind].items()):
+                for guild in guilds.intersection(subscribers):
+                    del subscribers[guild]
+                if len(subscribers) == 0:
+                    del self.sources[kind][source]
+
+    # set the notification channel of a guild for the given sources, defaults to all of them
+    def set_channel(self, guild, channel, kinds=CHANNEL_COLUMNS):
+        channels = self.channels.setdefault(
+            guild, dict.fromkeys(CHANNEL_COLUMNS))
+        for kind in kinds:
+            channels[kind] = channel
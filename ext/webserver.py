@@ -1,568 +1,621 @@
-import discord
-from discord.ext import commands
-
-from aiohttp import web
-import asyncio
-import auth_token
-import xmltodict
-import datetime
-import re
-import sys
-import traceback
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-
-
-def callback(result):
-    ex = result.exception()
-    if ex is not None:
-        traceback.print_exception(
-            type(ex), ex, ex.__traceback__, file=sys.stderr)
-
-
-class Webserver(commands.Cog):
-    """A webserver for handling notifications"""
-
-    def __init__(self, bot):
-        self.bot = bot
-        self.cleanr = re.compile('<.*?>')
-
-        # create the application and add routes
-        self.app = web.Application()
-        self.app.add_routes(
-            [web.get("/" + auth_token.google_callback_verification, self.googleverification)])
-        self.app.add_routes([web.post("/youtube", self.youtube)])
-        self.app.add_routes([web.get("/youtube", self.youtubeverification)])
-        self.app.add_routes([web.post("/twitch", self.twitch)])
-        self.app.add_routes([web.get("/twitch", self.twitchverification)])
-        self.app.add_routes([web.post("/surrenderat20", self.surrenderat20)])
-        self.app.add_routes(
-            [web.get("/surrenderat20", self.surrenderat20verification)])
-
-        # push notification run out after a specified time so I need to refresh them regularly
-        self.scheduler = AsyncIOScheduler(event_loop=self.bot.loop)
-        self.scheduler.add_job(self.refresh_subscriptions, "interval", days=3, id="refresher",
-                               replace_existing=True, next_run_time=datetime.datetime.utcnow() + datetime.timedelta(seconds=+10, hours=+2))
-        self.scheduler.add_job(
-            self.ping_feedburner, "interval", minutes=3, id="pinger", replace_existing=True)
-        self.scheduler.start()
-
-        # create the run task
-        self.bot.run_webserver = self.bot.loop.create_task(self.run())
-        self.post_updater = self.bot.loop.create_task(self.update_posts())
-        self.post_updater.add_done_callback(callback)
-
-    # run the webserver
-    async def run(self):
-        await self.bot.wait_until_ready()
-
-        self.runner = web.AppRunner(self.app)
-        await self.runner.setup()
-        self.site = web.TCPSite(self.runner)
-        await self.site.start()
-
-    # will be called by the scheduler above
-    # goes through all twitch and youtube channels in the database
-    # and refresh their subscription
-    async def refresh_subscriptions(self):
-        await self.bot.wait_until_ready()
-        async with self.bot.pool.acquire() as db:
-            cursor = await db.fetch("SELECT DISTINCT TwitchChannel FROM TwitchSubscriptions")
-            for row in cursor:
-                ID = row[0]
-                parsingChannelUrl = "https://api.twitch.tv/helix/webhooks/hub"
-                parsingChannelHeader = {'Client-ID': auth_token.twitch_id,
-                                        "Authorization": "Bearer " + auth_token.twitch_token}
-                parsingChannelQueryString = {"hub.mode": "subscribe", "hub.callback": auth_token.server_url + "/twitch",
-                                             "hub.topic": "https://api.twitch.tv/helix/streams?user_id=" + ID, "hub.lease_seconds": 864000}
-                async with self.bot.session.post(parsingChannelUrl, headers=parsingChannelHeader, params=parsingChannelQueryString) as resp:
-                    if resp.status != 202:
-                        print(resp.text)
-                await asyncio.sleep(2)
-
-            cursor = await db.fetch("SELECT DISTINCT YoutubeChannel FROM YoutubeSubscriptions")
-            for row in cursor:
-                ID = row[0]
-                parsingChannelUrl = "https://pubsubhubbub.appspot.com/subscribe"
-                parsingChannelQueryString = {"hub.mode": "subscribe", "hub.callback": auth_token.server_url + "/youtube",
-                                             "hub.topic": "https://www.youtube.com/xml/feeds/videos.xml?channel_id=" + ID, "hub.lease_seconds": 864000}
-                async with self.bot.session.post(parsingChannelUrl, headers=parsingChannelHeader, params=parsingChannelQueryString) as resp:
-                    if resp.status != 202:
-                        print(resp.text)
-                await asyncio.sleep(2)
-
-        async with self.bot.session.get("https://id.twitch.tv/oauth2/validate", headers={'Authorization': "OAuth " + auth_token.twitch_token}) as resp:
-            if resp.status != 200:
-                print(resp.text)
-
-                queryString = {"client_id": auth_token.twitch_id,
-                               "client_secret": auth_token.twitch_secret,
-                               "grant_type": "client_credentials"}
-                async with self.bot.session.post("https://id.twitch.tv/oauth2/token", params=queryString) as resp2:
-                    if resp2.status != 200:
-                        print(resp.text)
-                    else:
-                        auth_token.twitch_secret = await resp2.json()[
-                            "client_id"]
-
-    # pings feedburner to update feed
-
-    async def ping_feedburner(self):
-        parsingChannelUrl = "http://feedburner.google.com/fb/a/pingSubmit?bloglink=https%3A%2F%2Ffeeds.feedburner.com%2Fsurrenderat20%2FCqWw"
-        async with self.bot.session.get(parsingChannelUrl) as resp:
-            if resp.status != 200:
-                print(resp.text)
-
-    # update latest ff20 message on post update
-    async def update_posts(self):
-        await self.bot.wait_until_ready()
-
-        async with self.bot.pool.acquire() as db:
-            while not self.bot.is_closed():
-                cached_posts = {}
-                subscriptions = await db.fetch("SELECT * FROM SurrenderAt20Subscriptions")
-                for guild_subscriptions in subscriptions:
-                    if guild_subscriptions[7] is None:
-                        continue
-
-                    try:
-                        post_obj = cached_posts[guild_subscriptions[7]]
-                    except KeyError:
-                        parsingChannelUrl = "https://www.googleapis.com/blogger/v3/blogs/8141971962311514602/posts/" + \
-                            guild_subscriptions[7]
-                        parsingChannelQueryString = {
-                            "key": auth_token.google, "fields": "content,updated"}
-                        async with self.bot.session.get(parsingChannelUrl, params=parsingChannelQueryString) as resp:
-                            post_obj = await resp.json()
-                            if resp.status == 500:
-                                break
-                            cached_posts[guild_subscriptions[7]] = post_obj
-
-                    try:
-                        updated_dt = datetime.datetime.strptime(
-                            post_obj["updated"][:18] + "-0700", "%Y-%m-%dT%H:%M:%S%z")
-                    except KeyError:
-                        continue
-                    updated_timestamp = int(updated_dt.timestamp())
-                    if updated_timestamp <= guild_subscriptions[8]:
-                        continue
-
-                    content = post_obj["content"]
-                    channels = await db.fetchrow("SELECT SurrenderAt20NotifChannel FROM Guilds WHERE ID=$1", guild_subscriptions[0])
-                    channel = self.bot.get_channel(channels[0])
-                    if channel is None:
-                        continue
-
-                    try:
-                        message = await channel.get_message(guild_subscriptions[10])
-                    except Exception:   # frick you
-                        continue
-                    emb = message.embeds[0]
-
-                    emb.clear_fields()
-
-                    # get first image in post
-                    startImgPos = content.find('<img', 0, len(content)) + 4
-                    if(startImgPos > -1):
-                        endImgPos = content.find(
-                            '>', startImgPos, len(content))
-                        imageTag = content[startImgPos:endImgPos]
-                        if "'" in imageTag:
-                            apostrophe = "'"
-                        else:
-                            apostrophe = '"'
-                        startSrcPos = imageTag.find(
-                            'src=' + apostrophe, 0, len(content)) + 5
-                        endSrcPos = imageTag.find(
-                            apostrophe, startSrcPos, len(content))
-                        linkTag = imageTag[startSrcPos:endSrcPos]
-
-                        emb.set_image(url=linkTag)
-
-                    brokentext = content.replace("<br />", "\n")
-                    cleantext = re.sub(self.cleanr, '', brokentext).replace(
-                        "&nbsp;", " ").replace("amp;", "")
-
-                    firstpart = " ".join(cleantext.split("\n")[0:5])
-                    start = firstpart.find("[")
-                    end = firstpart.rfind("]")
-                    note = firstpart[start:end + 1]
-                    if note != "":
-                        emb.add_field(name=note, value="-")
-
-                    keywords = await db.fetch("SELECT Keyword FROM Keywords WHERE Guild=$1", guild_subscriptions[0])
-                    for keyword in keywords:
-                        kw = " " + keyword[0] + " "
-                        # check if keyword appears in post
-                        if kw in cleantext.lower():
-                            extracts = []
-                            # find paragraphs with keyword
-                            for part in cleantext.split("\n"):
-                                if kw in part.lower():
-                                    extracts.append(part.strip())
-
-                            # create message embed and send it to the server
-                            exctracts_string = "\n\n".join(extracts)
-                            if len(exctracts_string) > 950:
-                                exctracts_string = exctracts_string[:950] + "... `" + str(
-                                    cleantext.lower().count(kw)) + "` mentions in total"
-
-                            emb.add_field(
-                                name=f"'{keyword[0]}' was mentioned in this post!", value=exctracts_string, inline=False)
-
-                    emb.set_footer(text="Updates: " +
-                                   str(guild_subscriptions[9] + 1))
-                    try:
-                        await message.edit(embed=emb)
-                    except Exception:
-                        pass
-                    await db.execute("UPDATE SurrenderAt20Subscriptions SET LastUpdated=$1, Updates=$2 WHERE Guild=$3",
-                                     updated_timestamp, guild_subscriptions[9] + 1, guild_subscriptions[0])
-                    await asyncio.sleep(0.5)
-
-                await asyncio.sleep(60 * 2.5)
-
-    # handler for post requests to the /youtube route
-    async def youtube(self, request):
-        obj = xmltodict.parse(await request.text())
-        youtube_notifs = self.bot.loop.create_task(self.youtube_notifs(obj))
-        youtube_notifs.add_done_callback(callback)
-
-        return web.Response()
-
-    # handles the actual request to result in a timely response
-    async def youtube_notifs(self, obj):
-        # to check if the notification is about a video being deleted
-        try:
-            # if the request contains a "at:deleted-entry" parameter it is
-            # otherwise a keyerror is raised which will be ignored to continue on normally
-            obj["feed"]["at:deleted-entry"]
-            parsingChannelUrl = "https://www.googleapis.com/youtube/v3/channels"
-            parsingChannelQueryString = {"part": "statistics", "id": obj["feed"]["at:deleted-entry"]["at:by"]["uri"].split("/")[-1], "maxResults": "1",
-                                         "key": auth_token.google}
-            async with self.bot.session.get(parsingChannelUrl, params=parsingChannelQueryString) as resp:
-                ch = await resp.json()
-            async with self.bot.pool.acquire() as db:
-                await db.execute("UPDATE YoutubeChannels SET VideoCount=$1 WHERE ID=$2", int(ch["items"][0]["statistics"]["videoCount"]), ch["items"][0]["id"])
-            return
-        except KeyError:
-            pass
-
-        # getting the video data
-        parsingChannelUrl = "https://www.googleapis.com/youtube/v3/videos"
-        parsingChannelQueryString = {"part": "snippet", "id": obj["feed"]["entry"]["yt:videoId"], "maxResults": "1",
-                                     "key": auth_token.google}
-        async with self.bot.session.get(parsingChannelUrl, params=parsingChannelQueryString) as resp:
-            v = await resp.json()
-        if len(v["items"]) == 0:
-            # video not found, probably deleted already
-            return
-        video = v["items"][0]["snippet"]
-
-        # getting channel data
-        parsingChannelUrl = "https://www.googleapis.com/youtube/v3/channels"
-        parsingChannelQueryString = {"part": "snippet,statistics", "id": video["channelId"], "maxResults": "1",
-                                     "key": auth_token.google}
-        async with self.bot.session.get(parsingChannelUrl, params=parsingChannelQueryString) as resp:
-            ch = await resp.json()
-        channel_obj = ch["items"][0]
-
-        if isinstance(obj["feed"]["entry"]["link"], list):
-            url = obj["feed"]["entry"]["link"][0]["@href"]
-        else:
-            url = obj["feed"]["entry"]["link"]["@href"]
-
-        # creating message embed
-        emb = discord.Embed(title=video["title"],
-                            url=url,
-                            color=discord.Colour.red())
-        emb.timestamp = datetime.datetime.utcnow()
-        emb.set_image(url=video["thumbnails"]["high"]["url"])
-        emb.set_author(name=video["channelTitle"])
-        emb.set_footer(
-            icon_url=channel_obj["snippet"]["thumbnails"]["default"]["url"], text="Youtube")
-
-        # check if it's a video or a livestream
-        # if it is neither it is a livestream announcement which will be ignored
-        if video["liveBroadcastContent"] == "none":
-            announcement = "New Video live!"
-        elif video["liveBroadcastContent"] == "live":
-            announcement = video["channelTitle"] + " is now live!"
-        else:
-            return web
-
-        async with self.bot.pool.acquire() as db:
-            # if it is a livestream the bot shouldn't announce a livestream more than once in an hour
-            # to keep channels from getting spammed from stream restarts
-            if video["liveBroadcastContent"] == "live":
-                dt = await db.fetchval("SELECT LastLive FROM YoutubeChannels WHERE ID=$1", obj["feed"]["entry"]["yt:channelId"])
-                now = datetime.datetime.now(datetime.timezone.utc)
-                if ((now - dt).total_seconds() > 60 * 60):
-                    await db.execute("UPDATE YoutubeChannels SET LastLive=$1 WHERE ID=$2",
-                                     now, obj["feed"]["entry"]["yt:channelId"])
-                else:
-                    # stream was restarted
-                    return
-            else:
-                # youtube does not tell if the notification is about a new video
-                # or edits to an old one
-                # so this checks if it's a new video or just an edit
-                r = await db.fetch("SELECT LastVideoID, VideoCount FROM YoutubeChannels WHERE ID=$1", obj["feed"]["entry"]["yt:channelId"])
-                stats = r[0]
-                if obj["feed"]["entry"]["yt:videoId"] != stats[0] and int(channel_obj["statistics"]["videoCount"]) > stats[1]:
-                    await db.execute("UPDATE YoutubeChannels SET LastVideoID=$1, VideoCount=$2 WHERE ID=$3",
-                                     obj["feed"]["entry"]["yt:videoId"], int(channel_obj["statistics"]["videoCount"]), obj["feed"]["entry"]["yt:channelId"])
-                else:
-                    # A video has been edited
-                    return
-
-            # send messages in all subscribed servers
-            cursor = await db.fetch("SELECT Guilds.YoutubeNotifChannel, YoutubeSubscriptions.OnlyStreams, Guilds.ID \
-                                       FROM YoutubeSubscriptions INNER JOIN Guilds \
-                                       ON YoutubeSubscriptions.Guild=Guilds.ID \
-                                       WHERE YoutubeChannel=$1", obj["feed"]["entry"]["yt:channelId"])
-
-            for row in cursor:
-                # if the server set the subscription to "Only streams"
-                # videos will not be announced
-                if row[1] == 1 and video["liveBroadcastContent"] == "none":
-                    continue
-                announceChannel = self.bot.get_channel(row[0])
-                if announceChannel is None:
-                    guild = self.bot.get_guild(row[2])
-                    if guild is None:
-                        await db.execute("DELETE FROM YoutubeSubscriptions WHERE YoutubeChannel=$1 AND Guild=$2", obj["feed"]["entry"]["yt:channelId"], row[2])
-                    continue
-                await announceChannel.send(announcement, embed=emb)
-
-    # handler for post requests to the /twitch route
-    async def twitch(self, request):
-        obj = await request.json()
-        twitch_notifs = self.bot.loop.create_task(self.twitch_notifs(obj))
-        twitch_notifs.add_done_callback(callback)
-
-        return web.Response()
-
-    # handles the actual request to result in a timely response
-    async def twitch_notifs(self, obj):
-        # check if it's a "stream down" notification, it does not contain any content
-        if len(obj["data"]) == 0:
-            # stream down
-            return
-
-        data = obj["data"][0]
-
-        # getting channel data
-        parsingChannelUrl = "https://api.twitch.tv/helix/users"
-        parsingChannelHeader = {'Client-ID': auth_token.twitch_id,
-                                "Authorization": "Bearer " + auth_token.twitch_token}
-        parsingChannelQueryString = {"id": data["user_id"]}
-        async with self.bot.session.get(parsingChannelUrl, headers=parsingChannelHeader, params=parsingChannelQueryString) as resp:
-            channel_obj = await resp.json()
-        ch = channel_obj["data"][0]
-
-        # getting game data
-        parsingChannelUrl = "https://api.twitch.tv/helix/games"
-        parsingChannelHeader = {'Client-ID': auth_token.twitch_id,
-                                "Authorization": "Bearer " + auth_token.twitch_token}
-        parsingChannelQueryString = {"id": data["game_id"]}
-        async with self.bot.session.get(parsingChannelUrl, headers=parsingChannelHeader, params=parsingChannelQueryString) as resp:
-            game_obj = await resp.json()
-
-        # variables for game information
-        # if no game is specified a default will be chosen
-        if len(game_obj["data"]) == 0:
-            game_url = ""
-            game_name = "a stream"
-        else:
-            ga = game_obj["data"][0]
-            game_url = ga["box_art_url"].format(width=300, height=300)
-            game_name = ga["name"]
-
-        # creation of the message embed
-        emb = discord.Embed(title=data["title"],
-                            description=ch["display_name"],
-                            url="https://www.twitch.tv/" + ch["login"],
-                            color=discord.Colour.purple())
-        emb.timestamp = datetime.datetime.utcnow()
-        emb.set_image(url=data["thumbnail_url"].format(width=320, height=180))
-        emb.set_footer(icon_url=ch["profile_image_url"], text="Twitch")
-        emb.set_thumbnail(url=game_url)
-
-        async with self.bot.pool.acquire() as db:
-            # streams should only be announced every hour
-            # to keep channels from getting spammed with stream restarts
-            dt = await db.fetchval("SELECT LastLive FROM TwitchChannels WHERE ID=$1", ch["id"])
-            now = datetime.datetime.now(datetime.timezone.utc)
-            if (now - dt).total_seconds() > 60 * 60:
-                await db.execute("UPDATE TwitchChannels SET LastLive=$1 WHERE ID=$2", now, ch["id"])
-            else:
-                # stream was restarted
-                return
-
-            # sending messages to all subscribed servers
-            cursor = await db.fetch("SELECT Guilds.TwitchNotifChannel \
-                                       FROM TwitchSubscriptions INNER JOIN Guilds \
-                                       ON TwitchSubscriptions.Guild=Guilds.ID \
-                                       WHERE TwitchChannel=$1", data["user_id"])
-
-            for row in cursor:
-                announceChannel = self.bot.get_channel(row[0])
-                await announceChannel.send(ch["display_name"] + " is now live with " + game_name + " !", embed=emb)
-
-    # handler for post requests to the /surrenderat20 route
-    async def surrenderat20(self, request):
-        obj = await request.json()
-        ff20_notifs = self.bot.loop.create_task(self.surrenderat20_notifs(obj))
-        ff20_notifs.add_done_callback(callback)
-
-        return web.Response()
-
-    # handles the actual request to result in a timely response
-    async def surrenderat20_notifs(self, obj):
-        item = obj["items"][0]
-
-        emb = discord.Embed(title=item["title"],
-                            color=discord.Colour.orange(),
-                            url=item["permalinkUrl"],
-                            timestamp=datetime.datetime.utcnow())
-        try:
-            emb.description = " ".join(item["categories"])
-        except KeyError:
-            pass
-        emb.set_thumbnail(
-            url="https://images-ext-2.discordapp.net/external/p4GLboECWMVLnDH-Orv6nkWm3OG8uLdI2reNRQ9RX74/http/3.bp.blogspot.com/-M_ecJWWc5CE/Uizpk6U3lwI/AAAAAAAACLo/xyh6eQNRzzs/s640/sitethumb.jpg")
-        if item["actor"]["id"] == "Aznbeat":
-            author_img = "https://images-ext-2.discordapp.net/external/HI8rRYejC0QYULMmoDBTcZgJ52U0Msvwj9JmUxd-JAI/https/disqus.com/api/users/avatars/Aznbeat.jpg"
-        else:
-            author_img = "https://images-ext-2.discordapp.net/external/t0bRQzNtKHoIDcFcj2X8R0O0UPqeeyKdvawNbVMoHXE/https/disqus.com/api/users/avatars/Moobeat.jpg"
-        emb.set_author(name=item["actor"]["displayName"], icon_url=author_img)
-
-        try:
-            content = item["content"]
-        except KeyError:
-            parsingChannelUrl = "https://www.googleapis.com/blogger/v3/blogs/8141971962311514602/posts/" + \
-                item["id"][-19:]
-            parsingChannelQueryString = {
-                "key": auth_token.google, "fields": "content"}
-            async with self.bot.session.get(parsingChannelUrl, params=parsingChannelQueryString) as resp:
-                post_obj = await resp.json()
-            content = post_obj["content"]
-
-        # get first image in post
-        startImgPos = content.find('<img', 0, len(content)) + 4
-        if(startImgPos > -1):
-            endImgPos = content.find('>', startImgPos, len(content))
-            imageTag = content[startImgPos:endImgPos]
-            if "'" in imageTag:
-                apostrophe = "'"
-            else:
-                apostrophe = '"'
-            startSrcPos = imageTag.find(
-                'src=' + apostrophe, 0, len(content)) + 5
-            endSrcPos = imageTag.find(apostrophe, startSrcPos, len(content))
-            linkTag = imageTag[startSrcPos:endSrcPos]
-
-            emb.set_image(url=linkTag)
-
-        async with self.bot.pool.acquire() as db:
-            subscriptions = await db.fetch("SELECT * FROM SurrenderAt20Subscriptions")
-            for guild_subscriptions in subscriptions:
-                try:
-                    for category in item["categories"]:
-                        if category == "Red Posts":
-                            if guild_subscriptions[1]:
-                                break
-                        elif category == "PBE":
-                            if guild_subscriptions[2]:
-                                break
-                        elif category == "Rotations":
-                            if guild_subscriptions[3]:
-                                break
-                        elif category == "Esports":
-                            if guild_subscriptions[4]:
-                                break
-                        elif category == "Releases":
-                            if guild_subscriptions[5]:
-                                break
-                        else:
-                            if guild_subscriptions[6]:
-                                break
-                    else:
-                        continue
-                except KeyError:
-                    pass
-
-                brokentext = content.replace("<br />", "\n")
-                cleantext = re.sub(
-                    self.cleanr, '', brokentext).replace("&nbsp;", " ")
-
-                firstpart = " ".join(cleantext.split("\n")[0:5])
-                start = firstpart.find("[")
-                end = firstpart.rfind("]")
-                note = firstpart[start:end + 1]
-                if note != "":
-                    emb.add_field(name=note, value="-")
-
-                keywords = await db.fetch("SELECT Keyword FROM Keywords WHERE Guild=$1", guild_subscriptions[0])
-                for keyword in keywords:
-                    kw = " " + keyword[0] + " "
-                    # check if keyword appears in post
-                    if kw in cleantext.lower():
-                        extracts = []
-                        # find paragraphs with keyword
-                        for part in cleantext.split("\n"):
-                            if kw in part.lower():
-                                extracts.append(part.strip())
-
-                        # create message embed and send it to the server
-                        exctracts_string = "\n\n".join(extracts)
-                        if len(exctracts_string) > 950:
-                            exctracts_string = exctracts_string[:950] + "... `" + str(
-                                cleantext.lower().count(kw)) + "` mentions in total"
-
-                        emb.add_field(
-                            name=f"'{keyword[0]}' was mentioned in this post!", value=exctracts_string, inline=False)
-
-                # send post to discord channel
-                channels = await db.fetchrow("SELECT SurrenderAt20NotifChannel FROM Guilds WHERE ID=$1", guild_subscriptions[0])
-                channel = self.bot.get_channel(channels[0])
-                if channel is None:
-                    await db.execute("UPDATE SurrenderAt20Subscriptions SET Other=$1 WHERE Guild=$2", False, guild_subscriptions[0])
-                    continue
-                try:
-                    msg = await channel.send("New Surrender@20 post!", embed=emb)
-                except discord.errors.Forbidden:
-                    continue
-                finally:
-                    emb.clear_fields()
-
-                # set information for post updates
-                lastpostid = item["id"][-19:]
-                lastpostmessage = msg.id
-                lastupdated = item["updated"]
-                await db.execute("UPDATE SurrenderAt20Subscriptions \
-                                  SET LastPostID=$1, LastUpdated=$2, Updates=$3, LastPostMessage=$4 \
-                                  WHERE Guild=$5",
-                                 lastpostid, lastupdated, 0, lastpostmessage, guild_subscriptions[0])
-
-    # various verification endpoints
-
-    # will verify the url as my own to google
-    async def googleverification(self, request):
-        return web.Response(text="google-site-verification: " + auth_token.google_callback_verification)
-
-    # will verify youtube subscriptions
-    async def youtubeverification(self, request):
-        return web.Response(text=request.query["hub.challenge"])
-
-    # will verify twitch subscriptions
-    async def twitchverification(self, request):
-        return web.Response(text=request.query["hub.challenge"])
-
-    # will verify surrenderat20 subscription
-    async def surrenderat20verification(self, request):
-        return web.Response(text=request.query["hub.challenge"])
-
-
-def setup(bot):
-    bot.add_cog(Webserver(bot))
+import discord
+from discord.ext import commands
+
+from aiohttp import web
+import asyncio
+import auth_token
+import datetime
+import json
+import sys
+import traceback
+from xml.etree.ElementTree import ParseError
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from ext.subscriptions import ONLY_STREAMS, CATEGORIES, CATEGORY_BITS
+from ext.lookups import YoutubeLookup, TwitchLookup, YOUTUBE_BATCH_SIZE, TWITCH_BATCH_SIZE
+from ext.cache import IdempotencyStore
+from ext.atom import read_feed
+from ext.leases import LeaseScheduler, TICK as LEASE_TICK
+
+
+# surrender@20 post labels and the subscription categories they belong to
+# every other label belongs to "Other"
+POST_CATEGORIES = {"Red Posts": "RedPosts",
+                   "PBE": "PBE",
+                   "Rotations": "Rotations",
+                   "Esports": "Esports",
+                   "Releases": "Releases"}
+
+# number of notifications handled at the same time
+# every worker waits for its own lookups, there have to be enough of them to fill a lookup batch
+WORKERS = max(YOUTUBE_BATCH_SIZE, TWITCH_BATCH_SIZE)
+# notifications waiting to be handled at most, more are rejected
+INBOX_SIZE = 500
+# seconds hubs are asked to wait before delivering a rejected notification again
+RETRY_AFTER = 30
+
+# post updates are looked for since the last sweep, on first start since this many seconds ago
+INITIAL_SWEEP = 24 * 60 * 60
+
+# stored post embeds nobody refers to anymore are deleted after this many seconds
+POST_EMBED_RETENTION = 24 * 60 * 60
+
+
+def callback(result):
+    if result.cancelled():
+        return
+    ex = result.exception()
+    if ex is not None:
+        traceback.print_exception(
+            type(ex), ex, ex.__traceback__, file=sys.stderr)
+
+
+class Webserver(commands.Cog):
+    """A webserver for handling notifications"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.youtube_lookup = YoutubeLookup(self.bot)
+        self.twitch_lookup = TwitchLookup(self.bot)
+        # hubs deliver the same event more than once
+        self.events = IdempotencyStore()
+
+        # create the application and add routes
+        self.app = web.Application()
+        self.app.add_routes(
+            [web.get("/" + auth_token.google_callback_verification, self.googleverification)])
+        self.app.add_routes([web.post("/youtube", self.youtube)])
+        self.app.add_routes([web.get("/youtube", self.youtubeverification)])
+        self.app.add_routes([web.post("/twitch", self.twitch)])
+        self.app.add_routes([web.get("/twitch", self.twitchverification)])
+        self.app.add_routes([web.post("/surrenderat20", self.surrenderat20)])
+        self.app.add_routes(
+            [web.get("/surrenderat20", self.surrenderat20verification)])
+
+        # push notification run out after a specified time so I need to refresh them regularly
+        # the lease scheduler renews the ones which are about to run out every tick
+        self.leases = LeaseScheduler(self.bot)
+        self.scheduler = AsyncIOScheduler(event_loop=self.bot.loop)
+        self.scheduler.add_job(self.leases.renew_due, "interval", seconds=LEASE_TICK, id="refresher",
+                               replace_existing=True, next_run_time=datetime.datetime.utcnow() + datetime.timedelta(seconds=+10))
+        self.scheduler.add_job(self.validate_twitch_token, "interval", days=3, id="validator",
+                               replace_existing=True, next_run_time=datetime.datetime.utcnow() + datetime.timedelta(seconds=+10, hours=+2))
+        self.scheduler.add_job(
+            self.ping_feedburner, "interval", minutes=3, id="pinger", replace_existing=True)
+        self.scheduler.start()
+
+        # announcements are sent through the outbox
+        self.bot.get_cog("Outbox").register_hook(
+            "surrenderat20", self.surrenderat20_sent)
+
+        # notifications are handled by a fixed number of workers
+        # so a flood of them can't starve the rest of the bot
+        # workers mostly wait for lookups, the database pool limits how many use it at once
+        self.inbox = asyncio.Queue(maxsize=INBOX_SIZE)
+        self.rejected = 0
+
+        # time of the newest post update that was handled
+        self.posts_watermark = None
+        self.posts_swept = False
+        self.workers = [self.bot.loop.create_task(self.work()) for _ in range(WORKERS)]
+        for worker in self.workers:
+            worker.add_done_callback(callback)
+
+        # create the run task
+        self.bot.run_webserver = self.bot.loop.create_task(self.run())
+        self.post_updater = self.bot.loop.create_task(self.update_posts())
+        self.post_updater.add_done_callback(callback)
+
+    def cog_unload(self):
+        for worker in self.workers:
+            worker.cancel()
+
+    # run the webserver
+    async def run(self):
+        await self.bot.wait_until_ready()
+
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        self.site = web.TCPSite(self.runner)
+        await self.site.start()
+
+    # will be called by the scheduler above
+    # checks if the twitch token is still valid and requests a new one otherwise
+    async def validate_twitch_token(self):
+        await self.bot.wait_until_ready()
+        async with self.bot.session.get("https://id.twitch.tv/oauth2/validate", headers={'Authorization': "OAuth " + auth_token.twitch_token}) as resp:
+            if resp.status != 200:
+                print(resp.text)
+
+                queryString = {"client_id": auth_token.twitch_id,
+                               "client_secret": auth_token.twitch_secret,
+                               "grant_type": "client_credentials"}
+                async with self.bot.session.post("https://id.twitch.tv/oauth2/token", params=queryString) as resp2:
+                    if resp2.status != 200:
+                        print(resp.text)
+                    else:
+                        auth_token.twitch_secret = await resp2.json()[
+                            "client_id"]
+
+    # pings feedburner to update feed
+
+    async def ping_feedburner(self):
+        parsingChannelUrl = "http://feedburner.google.com/fb/a/pingSubmit?bloglink=https%3A%2F%2Ffeeds.feedburner.com%2Fsurrenderat20%2FCqWw"
+        async with self.bot.session.get(parsingChannelUrl) as resp:
+            if resp.status != 200:
+                print(resp.text)
+
+    # update latest ff20 message on post update
+    async def update_posts(self):
+        await self.bot.wait_until_ready()
+
+        async with self.bot.repository.acquire() as db:
+            self.posts_watermark = await db.watermark("surrenderat20")
+        if self.posts_watermark is None:
+            since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=INITIAL_SWEEP)
+            self.posts_watermark = since.isoformat(timespec="seconds")
+
+        while not self.bot.is_closed():
+            try:
+                await self.update_changed_posts()
+            except Exception as ex:
+                print('Ignoring exception in Webserver.update_posts()', file=sys.stderr)
+                traceback.print_exception(
+                    type(ex), ex, ex.__traceback__, file=sys.stderr)
+            await asyncio.sleep(60 * 2.5)
+
+    # all posts edited since the watermark and whether they changed since the last request
+    # None if blogger could not be reached
+    async def fetch_edited_posts(self):
+        parsingChannelUrl = "https://www.googleapis.com/blogger/v3/blogs/8141971962311514602/posts"
+        parsingChannelQueryString = {"key": auth_token.google, "updatedMin": self.posts_watermark,
+                                     "fetchBodies": "true", "orderBy": "updated", "maxResults": 20,
+                                     "fields": "nextPageToken,items(id,updated,content)"}
+        items = []
+        changed = False
+        while True:
+            status, posts_obj, modified = await self.bot.http_cache.get_json(
+                self.bot.session, parsingChannelUrl, params=parsingChannelQueryString)
+            if posts_obj is None:
+                return None
+            items.extend(posts_obj.get("items", []))
+            changed = changed or modified
+            if "nextPageToken" not in posts_obj:
+                return items, changed
+            parsingChannelQueryString = dict(parsingChannelQueryString,
+                                             pageToken=posts_obj["nextPageToken"])
+
+    # edit the announcements of posts which were updated since they were announced or last edited
+    async def update_changed_posts(self):
+        # one request returns every post edited since the last sweep
+        result = await self.fetch_edited_posts()
+        if result is None:
+            return
+        items, modified = result
+        # an unchanged answer was handled by the last sweep already, unless that sweep failed
+        if len(items) == 0 or (not modified and self.posts_swept):
+            return
+        self.posts_swept = False
+
+        changed = {}  # post id -> (update timestamp, post analysis)
+        for post_obj in items:
+            updated_dt = datetime.datetime.strptime(
+                post_obj["updated"][:18] + "-0700", "%Y-%m-%dT%H:%M:%S%z")
+            # the analysis is shared with the announcement of the post
+            changed[post_obj["id"]] = (int(updated_dt.timestamp()),
+                                       self.bot.posts.get(post_obj["id"], post_obj["content"]))
+
+        # servers which were sent one of the posts and haven't seen its latest update
+        # and the embeds the posts were announced with
+        async with self.bot.repository.acquire() as db:
+            rows = await db.surrenderat20_announcements(list(changed))
+            rows = [row for row in rows if changed[row[1]][0] > row[2]]
+            base_embeds = {}
+            if len(rows) > 0:
+                for row in await db.post_embeds(list({row[1] for row in rows})):
+                    base_embeds[row[0]] = json.loads(row[1])
+
+        updates = []
+        failed = False
+        for guild, post_id, last_updated, update_count, channel_id, message_id in rows:
+            updated_timestamp, analysis = changed[post_id]
+
+            # the edited embed is built from the stored one, only older announcements have to be fetched
+            if post_id in base_embeds and channel_id is not None:
+                emb = discord.Embed.from_dict(base_embeds[post_id])
+            else:
+                channel = self.bot.get_channel(
+                    self.bot.subscriptions.channel(guild, "surrenderat20"))
+                if channel is None:
+                    continue
+                try:
+                    message = await channel.get_message(message_id)
+                except Exception:   # frick you
+                    continue
+                emb = message.embeds[0]
+                emb.clear_fields()
+                channel_id = channel.id
+
+            if analysis.image is not None:
+                emb.set_image(url=analysis.image)
+            if analysis.note != "":
+                emb.add_field(name=analysis.note, value="-")
+
+            matches = analysis.keyword_matches(self.bot.keywords)
+            for keyword in self.bot.keywords.get(guild):
+                exctracts_string = matches.extract(keyword)
+                if exctracts_string is not None:
+                    emb.add_field(
+                        name=f"'{keyword}' was mentioned in this post!", value=exctracts_string, inline=False)
+
+            emb.set_footer(text="Updates: " + str(update_count + 1))
+            try:
+                await self.bot.http.edit_message(channel_id, message_id, embed=emb.to_dict())
+            except (discord.errors.Forbidden, discord.errors.NotFound):
+                # the message or the permissions are gone
+                pass
+            except Exception as ex:
+                print('Ignoring exception while editing a Surrender@20 post', file=sys.stderr)
+                traceback.print_exception(
+                    type(ex), ex, ex.__traceback__, file=sys.stderr)
+                failed = True
+                continue
+            updates.append((updated_timestamp, update_count + 1, guild))
+            await asyncio.sleep(0.5)
+
+        # the watermark is inclusive, the newest posts are looked at again but not edited twice
+        # it stays in place if an edit failed so the next sweep tries again
+        watermark = max((post_obj["updated"] for post_obj in items),
+                        key=datetime.datetime.fromisoformat)
+        async with self.bot.repository.acquire() as db:
+            async with db.transaction():
+                await db.set_surrenderat20_updates(updates)
+                if failed:
+                    return
+                await db.set_watermark("surrenderat20", watermark)
+                await db.prune_post_embeds(POST_EMBED_RETENTION)
+        self.posts_watermark = watermark
+        self.posts_swept = True
+
+    # queue a notification for the workers unless its event was handled before
+    # if the queue is full the hub is asked to deliver it again later
+    def dispatch(self, key, handler, obj):
+        if key is not None and not self.events.begin(key):
+            return web.Response()
+        try:
+            self.inbox.put_nowait((key, handler, obj))
+        except asyncio.QueueFull:
+            if key is not None:
+                self.events.discard(key)
+            self.rejected += 1
+            return web.Response(status=503, headers={"Retry-After": str(RETRY_AFTER)})
+        return web.Response()
+
+    # handles queued notifications one after another
+    async def work(self):
+        while True:
+            key, handler, obj = await self.inbox.get()
+            try:
+                await handler(obj)
+            except Exception as ex:
+                # a failed event can be handled again when it is redelivered
+                if key is not None:
+                    self.events.discard(key)
+                print(f'Ignoring exception in Webserver.{handler.__name__}()', file=sys.stderr)
+                traceback.print_exception(
+                    type(ex), ex, ex.__traceback__, file=sys.stderr)
+            else:
+                if key is not None:
+                    self.events.done(key)
+            finally:
+                self.inbox.task_done()
+
+    # handler for post requests to the /youtube route
+    async def youtube(self, request):
+        try:
+            feed = await read_feed(request.content)
+        except ParseError:
+            return web.Response(status=400)
+        return self.dispatch(self.youtube_event(feed), self.youtube_notifs, feed)
+
+    # an uploaded or updated video is identified by its id and update time
+    @staticmethod
+    def youtube_event(feed):
+        if feed.video_id is None:
+            return None
+        return ("youtube", feed.deleted, feed.video_id, feed.updated)
+
+    # handles the actual request to result in a timely response
+    async def youtube_notifs(self, feed):
+        # to check if the notification is about a video being deleted
+        if feed.deleted:
+            # a cached channel can keep count by itself
+            info = self.youtube_lookup.cached_channel(feed.channel_id)
+            if info is not None:
+                info.video_count -= 1
+            else:
+                info = await self.youtube_lookup.channel(feed.channel_id)
+                if info is None:
+                    return
+            async with self.bot.repository.acquire() as db:
+                await db.set_youtube_video_count(feed.channel_id, info.video_count)
+            return
+
+        # getting the video data
+        # lookups of notifications arriving at the same time are merged into one request
+        v = await self.youtube_lookup.video(feed.video_id)
+        if v is None:
+            # video not found, probably deleted already
+            return
+        video = v["snippet"]
+        published = datetime.datetime.strptime(
+            video["publishedAt"][:19], "%Y-%m-%dT%H:%M:%S").replace(tzinfo=datetime.timezone.utc)
+
+        # getting channel data
+        # a cached channel is only fetched again if its video count can't tell
+        # whether this video was counted already
+        info = self.youtube_lookup.cached_channel(video["channelId"])
+        fetched = info is None or (video["liveBroadcastContent"] == "none" and published <= info.counted_until)
+        if fetched:
+            info = await self.youtube_lookup.channel(video["channelId"])
+            if info is None:
+                return
+
+        # videos published after the count was taken are not included in it yet
+        video_count = info.video_count
+        if published > info.counted_until:
+            video_count += 1
+
+        # creating message embed
+        emb = discord.Embed(title=video["title"],
+                            url=feed.link,
+                            color=discord.Colour.red())
+        emb.timestamp = datetime.datetime.utcnow()
+        emb.set_image(url=video["thumbnails"]["high"]["url"])
+        emb.set_author(name=video["channelTitle"])
+        emb.set_footer(icon_url=info.thumbnail, text="Youtube")
+
+        # check if it's a video or a livestream
+        # if it is neither it is a livestream announcement which will be ignored
+        if video["liveBroadcastContent"] == "none":
+            announcement = "New Video live!"
+        elif video["liveBroadcastContent"] == "live":
+            announcement = video["channelTitle"] + " is now live!"
+        else:
+            return web
+
+        async with self.bot.repository.acquire() as db:
+            # if it is a livestream the bot shouldn't announce a livestream more than once in an hour
+            # to keep channels from getting spammed from stream restarts
+            if video["liveBroadcastContent"] == "live":
+                dt = await db.youtube_last_live(feed.channel_id)
+                now = datetime.datetime.now(datetime.timezone.utc)
+                if ((now - dt).total_seconds() > 60 * 60):
+                    await db.set_youtube_last_live(feed.channel_id, now)
+                else:
+                    # stream was restarted
+                    return
+            else:
+                # youtube does not tell if the notification is about a new video
+                # or edits to an old one
+                # so this checks if it's a new video or just an edit
+                stats = await db.youtube_last_video(feed.channel_id)
+                if feed.video_id != stats[0] and video_count > stats[1]:
+                    await db.set_youtube_last_video(feed.channel_id, feed.video_id, video_count)
+                    info.video_count = video_count
+                    info.counted_until = max(info.counted_until, published)
+                else:
+                    # A video has been edited
+                    # a stored count above youtube's, e.g. from a video which was counted twice,
+                    # would make the next uploads look like edits as well
+                    if fetched and stats[1] > info.api_count:
+                        await db.set_youtube_video_count(feed.channel_id, info.api_count)
+                    return
+
+        # send messages in all subscribed servers
+        messages = []
+        for sub in self.bot.subscriptions.get("youtube", feed.channel_id):
+            # if the server set the subscription to "Only streams"
+            # videos will not be announced
+            if sub.flags & ONLY_STREAMS and video["liveBroadcastContent"] == "none":
+                continue
+            announceChannel = self.bot.get_channel(sub.channel)
+            if announceChannel is None:
+                guild = self.bot.get_guild(sub.guild)
+                if guild is None:
+                    async with self.bot.repository.acquire() as db:
+                        await db.delete_youtube_subscription(feed.channel_id, sub.guild)
+                    self.bot.subscriptions.unsubscribe(
+                        "youtube", feed.channel_id, sub.guild)
+                continue
+            messages.append((sub.guild, announceChannel.id, announcement, emb))
+
+        await self.bot.get_cog("Outbox").enqueue("Youtube " + video["channelTitle"], messages)
+
+    # handler for post requests to the /twitch route
+    async def twitch(self, request):
+        obj = await request.json()
+        # stream down notifications have no data and nothing to deduplicate
+        if len(obj.get("data", [])) > 0:
+            key = ("twitch", obj["data"][0]["id"])
+        else:
+            key = None
+        return self.dispatch(key, self.twitch_notifs, obj)
+
+    # handles the actual request to result in a timely response
+    async def twitch_notifs(self, obj):
+        # check if it's a "stream down" notification, it does not contain any content
+        if len(obj["data"]) == 0:
+            # stream down
+            return
+
+        data = obj["data"][0]
+
+        # getting channel and game data
+        # both are cached, lookups of streams going live at the same time are merged
+        ch = await self.twitch_lookup.user(data["user_id"])
+        if ch is None:
+            return
+        ga = await self.twitch_lookup.game(data["game_id"])
+
+        # variables for game information
+        # if no game is specified a default will be chosen
+        if ga is None:
+            game_url = ""
+            game_name = "a stream"
+        else:
+            game_url = ga["box_art_url"].format(width=300, height=300)
+            game_name = ga["name"]
+
+        # creation of the message embed
+        emb = discord.Embed(title=data["title"],
+                            description=ch["display_name"],
+                            url="https://www.twitch.tv/" + ch["login"],
+                            color=discord.Colour.purple())
+        emb.timestamp = datetime.datetime.utcnow()
+        emb.set_image(url=data["thumbnail_url"].format(width=320, height=180))
+        emb.set_footer(icon_url=ch["profile_image_url"], text="Twitch")
+        emb.set_thumbnail(url=game_url)
+
+        async with self.bot.repository.acquire() as db:
+            # streams should only be announced every hour
+            # to keep channels from getting spammed with stream restarts
+            dt = await db.twitch_last_live(ch["id"])
+            now = datetime.datetime.now(datetime.timezone.utc)
+            if (now - dt).total_seconds() > 60 * 60:
+                await db.set_twitch_last_live(ch["id"], now)
+            else:
+                # stream was restarted
+                return
+
+        # sending messages to all subscribed servers
+        messages = []
+        for sub in self.bot.subscriptions.get("twitch", data["user_id"]):
+            announceChannel = self.bot.get_channel(sub.channel)
+            if announceChannel is None:
+                continue
+            messages.append((sub.guild, announceChannel.id,
+                             ch["display_name"] + " is now live with " + game_name + " !", emb))
+
+        await self.bot.get_cog("Outbox").enqueue("Twitch " + ch["display_name"], messages)
+
+    # handler for post requests to the /surrenderat20 route
+    async def surrenderat20(self, request):
+        obj = await request.json()
+        try:
+            item = obj["items"][0]
+            key = ("surrenderat20", item["id"], item.get("updated"))
+        except (KeyError, IndexError):
+            key = None
+        return self.dispatch(key, self.surrenderat20_notifs, obj)
+
+    # handles the actual request to result in a timely response
+    async def surrenderat20_notifs(self, obj):
+        item = obj["items"][0]
+
+        emb = discord.Embed(title=item["title"],
+                            color=discord.Colour.orange(),
+                            url=item["permalinkUrl"],
+                            timestamp=datetime.datetime.utcnow())
+        try:
+            emb.description = " ".join(item["categories"])
+        except KeyError:
+            pass
+        emb.set_thumbnail(
+            url="https://images-ext-2.discordapp.net/external/p4GLboECWMVLnDH-Orv6nkWm3OG8uLdI2reNRQ9RX74/http/3.bp.blogspot.com/-M_ecJWWc5CE/Uizpk6U3lwI/AAAAAAAACLo/xyh6eQNRzzs/s640/sitethumb.jpg")
+        if item["actor"]["id"] == "Aznbeat":
+            author_img = "https://images-ext-2.discordapp.net/external/HI8rRYejC0QYULMmoDBTcZgJ52U0Msvwj9JmUxd-JAI/https/disqus.com/api/users/avatars/Aznbeat.jpg"
+        else:
+            author_img = "https://images-ext-2.discordapp.net/external/t0bRQzNtKHoIDcFcj2X8R0O0UPqeeyKdvawNbVMoHXE/https/disqus.com/api/users/avatars/Moobeat.jpg"
+        emb.set_author(name=item["actor"]["displayName"], icon_url=author_img)
+
+        # post updates are edited into a copy of this embed
+        async with self.bot.repository.acquire() as db:
+            await db.store_post_embed(item["id"][-19:], json.dumps(emb.to_dict()))
+
+        try:
+            content = item["content"]
+        except KeyError:
+            parsingChannelUrl = "https://www.googleapis.com/blogger/v3/blogs/8141971962311514602/posts/" + \
+                item["id"][-19:]
+            parsingChannelQueryString = {
+                "key": auth_token.google, "fields": "content"}
+            async with self.bot.session.get(parsingChannelUrl, params=parsingChannelQueryString) as resp:
+                post_obj = await resp.json()
+            content = post_obj["content"]
+
+        # text, note, image and keyword mentions are the same for every server
+        analysis = self.bot.posts.get(item["id"][-19:], content)
+        if analysis.image is not None:
+            emb.set_image(url=analysis.image)
+        if analysis.note != "":
+            emb.add_field(name=analysis.note, value="-")
+        matches = analysis.keyword_matches(self.bot.keywords)
+
+        # find all guilds subscribed to any of the post's categories
+        try:
+            categories = [POST_CATEGORIES.get(category, "Other")
+                          for category in item["categories"]]
+        except KeyError:
+            categories = CATEGORIES
+        subscribers = self.bot.subscriptions.audience(categories)
+
+        messages = []
+        async with self.bot.repository.acquire() as db:
+            for sub in subscribers:
+                channel = self.bot.get_channel(sub.channel)
+                if channel is None:
+                    await db.set_surrenderat20_other(sub.guild, False)
+                    self.bot.subscriptions.set_category_mask(
+                        sub.guild, sub.flags & ~CATEGORY_BITS["Other"])
+                    continue
+
+                guild_emb = emb.copy()
+                for keyword in self.bot.keywords.get(sub.guild):
+                    exctracts_string = matches.extract(keyword)
+                    if exctracts_string is not None:
+                        guild_emb.add_field(
+                            name=f"'{keyword}' was mentioned in this post!", value=exctracts_string, inline=False)
+
+                messages.append(
+                    (sub.guild, channel.id, "New Surrender@20 post!", guild_emb))
+
+        # send post to discord channels, the post update information is set once they are sent
+        await self.bot.get_cog("Outbox").enqueue("Surrender@20 " + item["title"], messages, "surrenderat20",
+                                                 {"post": item["id"][-19:], "updated": item["updated"]})
+
+    # set information for post updates
+    async def surrenderat20_sent(self, results):
+        updates = [(data["post"], data["updated"], 0, msg.channel.id, msg.id, guild)
+                   for data, guild, msg in results]
+        async with self.bot.repository.acquire() as db:
+            await db.set_surrenderat20_last_posts(updates)
+
+    # various verification endpoints
+
+    # will verify the url as my own to google
+    async def googleverification(self, request):
+        return web.Response(text="google-site-verification: " + auth_token.google_callback_verification)
+
+    # will verify youtube subscriptions
+    async def youtubeverification(self, request):
+        self.record_lease(request)
+        return web.Response(text=request.query["hub.challenge"])
+
+    # will verify twitch subscriptions
+    async def twitchverification(self, request):
+        self.record_lease(request)
+        return web.Response(text=request.query["hub.challenge"])
+
+    # the lease is recorded in the background, a slow or failing database must not fail the verification
+    def record_lease(self, request):
+        task = self.bot.loop.create_task(self.leases.verify(request.query.copy()))
+        task.add_done_callback(callback)
+
+    # will verify surrenderat20 subscription
+    async def surrenderat20verification(self, request):
+        return web.Response(text=request.query["hub.challenge"])
+
+
+def setup(bot):
+    bot.add_cog(Webserver(bot))